@@ -25,13 +25,16 @@ INSTALLED_APPS = [
 
 # middleware configuration
 MIDDLEWARE = [
+    'shop.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'shop.middleware.ReplicaRoutingMiddleware',
 ]
 
 # url configuration
@@ -40,14 +43,21 @@ ROOT_URLCONF = 'braceurself.urls'
 # template configuration
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'shop.profiling.ProfiledDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # compiled templates are kept in memory, and reloaded on change while DEBUG is on
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'shop.context_processors.role',
             ],
         },
     },
@@ -62,9 +72,84 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # take the write lock when a transaction starts, so read-then-write
+            # transactions such as stock returns cannot interleave
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # read replica, refreshed from the primary with `manage.py refresh_replica`
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+# routes read-heavy pages to the replica
+DATABASE_ROUTERS = ['shop.routers.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+# seconds the replica may be behind before reads fall back to the primary
+REPLICA_MAX_LAG = 300
+# extra seconds the replica must be past a session's last write before it reads from it
+REPLICA_STICKY_SECONDS = 15
+
+
+# cache configuration, use a shared cache such as redis when running several processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'braceurself',
     }
 }
 
+# sessions are read from the cache and written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# logged-in users are loaded from the cache, only with a cache shared by all processes
+AUTHENTICATION_BACKENDS = ['shop.backends.CachedModelBackend']
+
+# seconds that cached users and roles are kept
+ROLE_CACHE_TIMEOUT = 300
+
+# seconds that rendered catalog and design cards are kept
+FRAGMENT_CACHE_TIMEOUT = 86400
+
+# seconds that full catalog pages for anonymous visitors are kept
+PAGE_CACHE_TIMEOUT = 600
+
+
+# request profiling, adds Server-Timing headers and feeds the seller perf page
+SHOP_PROFILING = False
+# requests slower than this are logged with their sql
+SLOW_REQUEST_MS = 500
+# number of recent requests kept per url name
+PROFILING_WINDOW = 1000
+
+# logging configuration
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'shop.perf': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+
+# hours an order may wait for payment before it is cancelled by `manage.py expire_orders`
+ORDER_PAYMENT_HOLD_HOURS = 48
+
 
 # password validation
 AUTH_PASSWORD_VALIDATORS = [
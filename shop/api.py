@@ -0,0 +1,261 @@
+# read-only json api (v1) over products, designs, orders and order messages
+# lists support ?fields= (sparse fieldsets), ?ids= (batch fetch), ?cursor= and ?limit=
+
+import base64
+import binascii
+import hashlib
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.vary import vary_on_cookie
+
+from .filters import filter_orders
+from .http_cache import catalog_queryset
+from .models import CustomBraceletDesign, Order, OrderMessage
+from .routers import reads_from_replica
+
+# page sizes for cursor pagination
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# most ids accepted by one batch fetch
+MAX_IDS = 100
+
+
+# an error answered as {"error": message} with the given status
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# url of a stored image, None when there is no image
+def _image_url(name):
+    return default_storage.url(name) if name else None
+
+
+# api field name -> (queryset lookup, converter applied to the value)
+PRODUCT_FIELDS = {
+    'id': ('id', None),
+    'name': ('name', None),
+    'price': ('price', None),
+    'stock': ('stock', None),
+    'image': ('image', _image_url),
+    'seller': ('created_by__user__username', None),
+    'created_at': ('created_at', None),
+    'updated_at': ('updated_at', None),
+}
+
+DESIGN_FIELDS = {
+    'id': ('id', None),
+    'name': ('name', None),
+    'beads': ('beads', None),
+    'customer': ('customer__username', None),
+    'created_at': ('created_at', None),
+    'updated_at': ('updated_at', None),
+}
+
+ORDER_FIELDS = {
+    'id': ('id', None),
+    'product': ('product_id', None),
+    'product_name': ('product__name', None),
+    'custom_design': ('custom_design_id', None),
+    'customer': ('customer__username', None),
+    'quantity': ('quantity', None),
+    'unit_price': ('unit_price', None),
+    'line_total': ('line_total', None),
+    'payment_type': ('payment_type', None),
+    'status': ('status', None),
+    'done': ('done', None),
+    'cancelled': ('cancelled', None),
+    'cancel_reason': ('cancel_reason', None),
+    'created_at': ('created_at', None),
+    'delivered_at': ('delivered_at', None),
+}
+
+MESSAGE_FIELDS = {
+    'id': ('id', None),
+    'order': ('order_id', None),
+    'sender': ('sender__username', None),
+    'text': ('text', None),
+    'image': ('image', _image_url),
+    'timestamp': ('timestamp', None),
+}
+
+
+# turns the returned data into a json response with an etag, answering 304 when it is unchanged
+def api_view(view_func):
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            response = JsonResponse({'error': "Method not allowed."}, status=405)
+            response['Allow'] = 'GET, HEAD'
+            return response
+        try:
+            data = view_func(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+        response = JsonResponse(data, json_dumps_params={'separators': (',', ':')})
+        # responses depend on the user, so only the browser may keep them, and must revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+        etag = f'"{hashlib.md5(response.content).hexdigest()}"'
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag, response=response)
+    return gzip_page(vary_on_cookie(reads_from_replica(wrapper)))
+
+
+def _require_login(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, "Authentication required.")
+
+
+# requested fields in the order given, id is always included
+def _fields(request, field_map):
+    value = request.GET.get('fields', '').strip()
+    if not value:
+        return list(field_map)
+    names = ['id'] + [name.strip() for name in value.split(',') if name.strip() and name.strip() != 'id']
+    unknown = [name for name in names if name not in field_map]
+    if unknown:
+        raise ApiError(400, f"Unknown field(s): {', '.join(unknown)}.")
+    return list(dict.fromkeys(names))
+
+
+# ids of a batch fetch, None when ?ids= is not given
+def _ids(request):
+    value = request.GET.get('ids')
+    if value is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise ApiError(400, "ids must be a comma separated list of numbers.")
+    if len(ids) > MAX_IDS:
+        raise ApiError(400, f"At most {MAX_IDS} ids can be fetched at once.")
+    return ids
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "limit must be a number.")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+# cursors are the opaque, url-safe form of the last id a client has seen
+def _encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError(400, "Invalid cursor.")
+
+
+# selects only the requested columns and renames them to the api field names
+def _rows(queryset, field_map, fields):
+    lookups = [field_map[name][0] for name in fields]
+    for row in queryset.values(*lookups):
+        item = {}
+        for name, lookup in zip(fields, lookups):
+            convert = field_map[name][1]
+            item[name] = convert(row[lookup]) if convert else row[lookup]
+        yield item
+
+
+# one page of a list, or the requested objects of a batch fetch in the order asked for
+def _list(request, queryset, field_map, newest_first=False):
+    fields = _fields(request, field_map)
+    ids = _ids(request)
+    if ids is not None:
+        found = {item['id']: item for item in _rows(queryset.filter(id__in=ids), field_map, fields)}
+        return {
+            'results': [found[object_id] for object_id in ids if object_id in found],
+            'missing': [object_id for object_id in ids if object_id not in found],
+        }
+
+    # keyset pagination on id, so pages stay cheap and stable while rows are added
+    limit = _limit(request)
+    queryset = queryset.order_by('-id' if newest_first else 'id')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        last_id = _decode_cursor(cursor)
+        queryset = queryset.filter(id__lt=last_id) if newest_first else queryset.filter(id__gt=last_id)
+    results = list(_rows(queryset[:limit + 1], field_map, fields))
+
+    next_url = None
+    if len(results) > limit:
+        results = results[:limit]
+        params = request.GET.copy()
+        params['cursor'] = _encode_cursor(results[-1]['id'])
+        next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return {'results': results, 'next': next_url}
+
+
+def _detail(request, queryset, field_map, object_id):
+    fields = _fields(request, field_map)
+    item = next(_rows(queryset.filter(id=object_id), field_map, fields), None)
+    if item is None:
+        raise ApiError(404, "Not found.")
+    return item
+
+
+# orders the user can see: their own as a customer, orders of their products as a seller
+def _visible_orders(request):
+    _require_login(request)
+    if request.is_seller:
+        return Order.objects.filter(seller_id=request.seller_profile_id)
+    return Order.objects.filter(customer=request.user)
+
+
+# catalog products, public like the catalog page
+@api_view
+def products(request):
+    return _list(request, catalog_queryset(), PRODUCT_FIELDS)
+
+
+@api_view
+def product_detail(request, product_id):
+    return _detail(request, catalog_queryset(), PRODUCT_FIELDS, product_id)
+
+
+# custom bracelet designs, ?mine=yes for the user's own designs
+@api_view
+def designs(request):
+    _require_login(request)
+    queryset = CustomBraceletDesign.objects.all()
+    if request.GET.get('mine') == 'yes':
+        queryset = queryset.filter(customer=request.user)
+    return _list(request, queryset, DESIGN_FIELDS, newest_first=True)
+
+
+# a single design, public like the design detail page
+@api_view
+def design_detail(request, design_id):
+    return _detail(request, CustomBraceletDesign.objects.all(), DESIGN_FIELDS, design_id)
+
+
+# orders with the order list filters: status, cancelled, date_from, date_to
+@api_view
+def orders(request):
+    queryset, _ = filter_orders(_visible_orders(request), request.GET)
+    return _list(request, queryset, ORDER_FIELDS, newest_first=True)
+
+
+@api_view
+def order_detail(request, order_id):
+    return _detail(request, _visible_orders(request), ORDER_FIELDS, order_id)
+
+
+# messages of one order, oldest first
+@api_view
+def order_messages(request, order_id):
+    if not _visible_orders(request).filter(id=order_id).exists():
+        raise ApiError(404, "Not found.")
+    return _list(request, OrderMessage.objects.filter(order_id=order_id), MESSAGE_FIELDS)
@@ -0,0 +1,12 @@
+# app configuration for the shop application
+
+from django.apps import AppConfig
+
+
+class ShopConfig(AppConfig):
+    name = 'shop'
+    default_auto_field = 'django.db.models.BigAutoField'
+
+    # connects the signal handlers once the models are loaded
+    def ready(self):
+        from . import signals  # noqa: F401
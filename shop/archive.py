@@ -0,0 +1,118 @@
+# moves old finished orders into archive tables and reads them back when asked
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F, Q, Sum, Value
+from django.utils import timezone
+
+from .models import (ArchivedOrder, ArchivedOrderMessage, ArchivedOrderRollup,
+                     Order, OrderMessage)
+
+# orders moved per transaction
+ARCHIVE_BATCH_SIZE = 500
+
+# columns copied from Order to ArchivedOrder
+ORDER_COLUMNS = [
+    'id', 'customer_id', 'product_id', 'quantity', 'unit_price', 'line_total',
+    'payment_type', 'status', 'created_at', 'delivered_at', 'done', 'cancelled',
+    'cancel_reason', 'custom_design_id', 'seller_id',
+]
+
+# columns copied from OrderMessage to ArchivedOrderMessage
+MESSAGE_COLUMNS = ['id', 'order_id', 'sender_id', 'text', 'image', 'timestamp']
+
+
+# finished or cancelled orders placed before the cutoff
+def archivable_orders(cutoff):
+    return Order.objects.filter(Q(done=True) | Q(cancelled=True), created_at__lt=cutoff)
+
+
+# moves finished and cancelled orders older than the given age into the archive tables
+# returns the number of orders archived
+def archive_orders(older_than_days, batch_size=ARCHIVE_BATCH_SIZE):
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            order_ids = list(archivable_orders(cutoff).order_by('id')
+                             .values_list('id', flat=True)[:batch_size])
+            if not order_ids:
+                break
+            _archive_batch(order_ids)
+        archived += len(order_ids)
+    return archived
+
+
+# copies one batch of orders with their messages, updates the rollups, then deletes the originals
+def _archive_batch(order_ids):
+    orders = list(Order.objects.filter(id__in=order_ids).values(
+        *ORDER_COLUMNS, product_seller_id=F('product__created_by_id')))
+    for row in orders:
+        # orders from before the seller column, until backfill_order_sellers has run
+        row['seller_id'] = row['seller_id'] or row['product_seller_id']
+    ArchivedOrder.objects.bulk_create([
+        ArchivedOrder(**{column: row[column] for column in ORDER_COLUMNS}) for row in orders
+    ])
+    ArchivedOrderMessage.objects.bulk_create([
+        ArchivedOrderMessage(**row)
+        for row in OrderMessage.objects.filter(order_id__in=order_ids).values(*MESSAGE_COLUMNS)
+    ])
+    _add_to_rollups(orders)
+    OrderMessage.objects.filter(order_id__in=order_ids).delete()
+    Order.objects.filter(id__in=order_ids).delete()
+
+
+# adds archived orders to the per-seller, per-day totals
+def _add_to_rollups(orders):
+    totals = defaultdict(lambda: {'orders': 0, 'completed': 0, 'cancelled': 0, 'earnings': Decimal('0.00')})
+    for row in orders:
+        day = timezone.localdate(row['created_at'])
+        total = totals[(row['seller_id'], day)]
+        total['orders'] += 1
+        if row['cancelled']:
+            total['cancelled'] += 1
+        elif row['done']:
+            total['completed'] += 1
+            total['earnings'] += row['line_total'] or Decimal('0.00')
+
+    for (seller_id, day), total in totals.items():
+        updated = ArchivedOrderRollup.objects.filter(seller_id=seller_id, day=day).update(
+            **{field: F(field) + Value(value) for field, value in total.items()})
+        if not updated:
+            ArchivedOrderRollup.objects.create(seller_id=seller_id, day=day, **total)
+
+
+# overall totals of a seller's archived orders
+def archived_totals(seller_profile_id):
+    totals = ArchivedOrderRollup.objects.filter(seller_id=seller_profile_id).aggregate(
+        orders=Sum('orders'), completed=Sum('completed'),
+        cancelled=Sum('cancelled'), earnings=Sum('earnings'))
+    return {key: value or 0 for key, value in totals.items()}
+
+
+# paginates live and archived orders together as one list sorted by sort_by
+def paginate_with_archived(live_qs, archived_qs, sort_by, sort_dir, page_number, per_page=10):
+    order_field = sort_by if sort_dir == 'asc' else f"-{sort_by}"
+    rows = (
+        live_qs.order_by().annotate(archived=Value(False)).values_list('id', sort_by, 'archived')
+        .union(archived_qs.order_by().annotate(archived=Value(True))
+               .values_list('id', sort_by, 'archived'), all=True)
+        .order_by(order_field, '-id')
+    )
+    page_obj = Paginator(rows, per_page).get_page(page_number)
+
+    # load the page's orders from each table and put them back in page order
+    page_rows = list(page_obj.object_list)
+    live = Order.objects.select_related('product', 'customer').in_bulk(
+        [order_id for order_id, _, archived in page_rows if not archived])
+    old = ArchivedOrder.objects.select_related('product', 'customer').in_bulk(
+        [order_id for order_id, _, archived in page_rows if archived])
+    page_obj.object_list = [
+        (old if archived else live)[order_id] for order_id, _, archived in page_rows
+        if order_id in (old if archived else live)
+    ]
+    return page_obj
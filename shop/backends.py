@@ -0,0 +1,31 @@
+# authentication backend that keeps logged-in users in the cache
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .roles import role_cache_timeout
+
+# cache key for a logged-in user
+USER_KEY = 'shop:user:{}'
+
+# cache backends private to one process, deleting a key there does not reach the other workers
+PROCESS_LOCAL_CACHES = (DummyCache, LocMemCache)
+
+
+# loads the session's user from the cache instead of the database
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        user_cache = caches['default']
+        # password changes, deactivations and logouts only expire the user in the worker that
+        # handled them, so users are cached only when every worker shares the cache
+        if isinstance(user_cache, PROCESS_LOCAL_CACHES):
+            return super().get_user(user_id)
+        key = USER_KEY.format(user_id)
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                user_cache.set(key, user, role_cache_timeout())
+        return user
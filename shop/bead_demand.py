@@ -0,0 +1,110 @@
+# bead bill of materials for open custom orders, kept as per-day counters per seller and bead type
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from .leaderboards import bump_counter
+from .models import BeadDemand, CustomBraceletDesign
+
+# order columns the bead counts are computed from
+ORDER_VALUES = ('custom_design_id', 'quantity', 'created_at', 'seller_id')
+
+
+# counts the beads of newly placed custom orders
+def add_open_orders(orders):
+    _record(orders, 1)
+
+
+# takes custom orders out of the counts once they are completed, cancelled or deleted
+# call it while the orders are still open
+def remove_open_orders(orders):
+    _record(orders, -1)
+
+
+# order values from a queryset or from a list of Order objects
+def _order_rows(orders):
+    if isinstance(orders, QuerySet):
+        return list(orders.filter(custom_design__isnull=False).values(*ORDER_VALUES))
+    return [{
+        'custom_design_id': order.custom_design_id,
+        'quantity': order.quantity,
+        'created_at': order.created_at,
+        'seller_id': order.seller_id,
+    } for order in orders if order.custom_design_id]
+
+
+# (shape, color, size, letter) of a stored bead, lenient with designs saved before validation
+def bead_key(bead):
+    return (
+        str(bead.get('shape', '')),
+        str(bead.get('color', '')).lower(),
+        str(bead.get('size', '')),
+        str(bead.get('letter') or '')[:1],
+    )
+
+
+# bead counts per (seller, day, shape, color, size, letter) for a set of orders
+def count_beads(orders):
+    rows = _order_rows(orders)
+    designs = CustomBraceletDesign.objects.only('beads').in_bulk(
+        {row['custom_design_id'] for row in rows})
+    totals = Counter()
+    for row in rows:
+        design = designs.get(row['custom_design_id'])
+        if design is None or row['seller_id'] is None:
+            continue
+        day = timezone.localdate(row['created_at'])
+        for bead in design.beads or []:
+            if isinstance(bead, dict):
+                totals[(row['seller_id'], day, *bead_key(bead))] += row['quantity']
+    return totals
+
+
+# adds the bead counts of the orders times sign, one UPDATE per counter row
+def _record(orders, sign):
+    for (seller_id, day, shape, color, size, letter), count in count_beads(orders).items():
+        lookup = {'seller_id': seller_id, 'day': day, 'shape': shape,
+                  'color': color, 'size': size, 'letter': letter}
+        bump_counter(BeadDemand, lookup, {'count': sign * count})
+
+
+# first day of the current week, weeks start on monday
+def week_start():
+    today = timezone.localdate()
+    return today - timedelta(days=today.weekday())
+
+
+# counter rows of a seller, for orders placed between start and end (inclusive) when given
+def demand_rows(seller_profile_id, start=None, end=None, **beads):
+    rows = BeadDemand.objects.filter(seller_id=seller_profile_id, **beads)
+    if start:
+        rows = rows.filter(day__gte=start)
+    if end:
+        rows = rows.filter(day__lte=end)
+    return rows
+
+
+# beads needed per shape, color and size, letters counted together, most needed first
+def demand_by_bead(rows):
+    return list(
+        rows.values('shape', 'color', 'size').annotate(beads=Sum('count'))
+        .filter(beads__gt=0).order_by('-beads', 'shape', 'color', 'size')
+    )
+
+
+# letter beads needed per letter
+def demand_by_letter(rows):
+    return list(
+        rows.exclude(letter='').values('letter').annotate(beads=Sum('count'))
+        .filter(beads__gt=0).order_by('letter')
+    )
+
+
+# number of one kind of bead needed, e.g. red medium hearts for orders placed this week
+def beads_needed(seller_profile_id, shape, color, size, start=None, end=None):
+    rows = demand_rows(seller_profile_id, start, end, shape=shape, color=color.lower(), size=size)
+    return rows.aggregate(total=Sum('count'))['total'] or 0
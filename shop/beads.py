@@ -0,0 +1,112 @@
+# validation and canonical form of custom bracelet bead designs
+
+import json
+
+# display names of the allowed bead values, also used by CustomBraceletDesign.text_form
+SHAPE_NAMES = {
+    'circle': 'Circle',
+    'square': 'Square',
+    'triangle': 'Triangle',
+    'star': 'Star',
+    'heart': 'Heart',
+    'hexagon': 'Hexagon',
+    'diamond': 'Diamond',
+}
+COLOR_NAMES = {
+    '#ff0000': 'Red',
+    '#0000ff': 'Blue',
+    '#00ff00': 'Green',
+    '#ffff00': 'Yellow',
+    '#ff00ff': 'Magenta',
+    '#00ffff': 'Cyan',
+    '#ffffff': 'White',
+    '#000000': 'Black',
+    '#ffa500': 'Orange',
+    '#964b00': 'Brown',
+    '#808080': 'Gray',
+    '#ffc0cb': 'Pink',
+    '#8b00ff': 'Violet',
+    '#ffd700': 'Gold',
+    '#228b22': 'Forest Green',
+    '#b22222': 'Firebrick',
+}
+SIZE_NAMES = {
+    'small': 'Small',
+    'medium': 'Medium',
+    'large': 'Large',
+}
+
+# allowed values as sets, built once at import
+BEAD_SHAPES = frozenset(SHAPE_NAMES)
+BEAD_COLORS = frozenset(COLOR_NAMES)
+BEAD_SIZES = frozenset(SIZE_NAMES)
+BEAD_KEYS = frozenset({'shape', 'color', 'size', 'letter'})
+
+# number of beads a design must have
+MIN_BEADS = 15
+MAX_BEADS = 25
+
+# longest accepted bead json, a full design from the designer is under 2000 characters
+MAX_PAYLOAD_SIZE = 8000
+
+
+# checks a bead list (or its json text) and returns it in canonical form:
+# only known keys, lowercase hex colors, and a letter only when the bead has one
+# raises ValueError with a message for the user when the design is not valid
+def clean_beads(payload):
+    if isinstance(payload, (str, bytes)):
+        if len(payload) > MAX_PAYLOAD_SIZE:
+            raise ValueError("Design data is too large.")
+        try:
+            payload = json.loads(payload)
+        except (ValueError, RecursionError):
+            raise ValueError("Design data is not valid.")
+    if not isinstance(payload, list):
+        raise ValueError("Design data must be a list of beads.")
+    if not MIN_BEADS <= len(payload) <= MAX_BEADS:
+        raise ValueError(f"Design must have {MIN_BEADS}-{MAX_BEADS} beads.")
+
+    beads = []
+    for number, bead in enumerate(payload, 1):
+        if not isinstance(bead, dict):
+            raise ValueError(f"Bead {number} is not valid.")
+        if not bead.keys() <= BEAD_KEYS:
+            raise ValueError(f"Bead {number} has unknown properties.")
+        shape = bead.get('shape')
+        if not isinstance(shape, str) or shape not in BEAD_SHAPES:
+            raise ValueError(f"Bead {number} has an unknown shape.")
+        color = bead.get('color')
+        if not isinstance(color, str) or (color := color.lower()) not in BEAD_COLORS:
+            raise ValueError(f"Bead {number} has a color outside the palette.")
+        size = bead.get('size')
+        if not isinstance(size, str) or size not in BEAD_SIZES:
+            raise ValueError(f"Bead {number} has an unknown size.")
+        letter = bead.get('letter') or ''
+        if letter and (not isinstance(letter, str) or len(letter) != 1 or not letter.isalnum()):
+            raise ValueError(f"Bead {number} letter must be a single letter or digit.")
+
+        clean = {'shape': shape, 'color': color, 'size': size}
+        if letter:
+            clean['letter'] = letter
+        beads.append(clean)
+    return beads
+
+
+# validates many designs, e.g. from an import file, each a dict with a name and beads
+# returns ([(index, name, clean beads)], [(index, error)])
+def validate_designs(designs, max_name_length=100):
+    valid, errors = [], []
+    for index, design in enumerate(designs):
+        if not isinstance(design, dict):
+            errors.append((index, "Design is not an object."))
+            continue
+        name = design.get('name')
+        name = name.strip() if isinstance(name, str) else ''
+        if not name or len(name) > max_name_length:
+            errors.append((index, f"Name is required and at most {max_name_length} characters."))
+            continue
+        try:
+            valid.append((index, name, clean_beads(design.get('beads'))))
+        except ValueError as error:
+            errors.append((index, str(error)))
+    return valid, errors
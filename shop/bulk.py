@@ -0,0 +1,229 @@
+# set-based bulk edits for products and orders
+
+import csv
+import io
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.utils import timezone
+
+from .bead_demand import remove_open_orders
+from .leaderboards import record_cancelled, record_completed
+from .models import Order, Product
+from .seller_cache import expire_seller_cache
+
+# columns that bulk product edits may change
+EDITABLE_PRODUCT_FIELDS = ('name', 'price', 'stock')
+
+# rows written per UPDATE statement
+BULK_BATCH_SIZE = 500
+
+# cancel reason recorded on orders that expired without payment
+EXPIRED_CANCEL_REASON = "Automatically cancelled: payment was not received in time."
+
+# limits taken from the Product model fields
+MAX_NAME_LENGTH = Product._meta.get_field('name').max_length
+MAX_PRICE = Decimal('999999.99')
+
+
+# validates one edited row, blank values mean "leave unchanged"
+def clean_product_row(raw):
+    errors = []
+    changes = {}
+    try:
+        product_id = int(str(raw.get('id', '')).strip())
+    except ValueError:
+        return None, {}, ["Missing or invalid product id."]
+
+    name = (raw.get('name') or '').strip()
+    if name:
+        if len(name) > MAX_NAME_LENGTH:
+            errors.append(f"Name is longer than {MAX_NAME_LENGTH} characters.")
+        elif name.startswith('Custom:'):
+            errors.append("Names starting with 'Custom:' are reserved for custom bracelets.")
+        else:
+            changes['name'] = name
+
+    price = str(raw.get('price') or '').strip()
+    if price:
+        try:
+            value = Decimal(price)
+        except InvalidOperation:
+            errors.append(f"Invalid price '{price}'.")
+        else:
+            if not value.is_finite() or value < 0 or value > MAX_PRICE:
+                errors.append(f"Price must be between 0 and {MAX_PRICE}.")
+            elif value != value.quantize(Decimal('0.01')):
+                errors.append("Price can have at most 2 decimal places.")
+            else:
+                changes['price'] = value.quantize(Decimal('0.01'))
+
+    stock = str(raw.get('stock') or '').strip()
+    if stock:
+        try:
+            value = int(stock)
+        except ValueError:
+            errors.append(f"Invalid stock '{stock}'.")
+        else:
+            if value < 0:
+                errors.append("Stock cannot be negative.")
+            else:
+                changes['stock'] = value
+
+    return product_id, changes, errors
+
+
+# applies edited rows to a seller's products in one transaction, writing only changed columns
+# rows is a list of (label, raw dict) pairs, returns (number of products updated, [(label, error)])
+def apply_product_changes(seller_profile_id, rows):
+    errors = []
+    cleaned = {}
+    labels = {}
+    for label, raw in rows:
+        product_id, changes, row_errors = clean_product_row(raw)
+        if product_id is not None and product_id in cleaned:
+            row_errors.append(f"Product {product_id} appears more than once.")
+        if row_errors:
+            errors.extend((label, error) for error in row_errors)
+            continue
+        cleaned[product_id] = changes
+        labels[product_id] = label
+
+    with transaction.atomic():
+        # custom bracelet products belong to a single order and are not editable here
+        products = Product.objects.filter(
+            created_by_id=seller_profile_id, id__in=list(cleaned)
+        ).exclude(name__startswith='Custom:').only('id', *EDITABLE_PRODUCT_FIELDS).in_bulk()
+
+        # group products by the set of columns that actually changed
+        now = timezone.now()
+        groups = defaultdict(list)
+        for product_id, changes in cleaned.items():
+            product = products.get(product_id)
+            if product is None:
+                errors.append((labels[product_id], f"Product {product_id} not found."))
+                continue
+            changed = tuple(sorted(
+                field for field, value in changes.items() if getattr(product, field) != value))
+            if not changed:
+                continue
+            for field in changed:
+                setattr(product, field, changes[field])
+            product.updated_at = now
+            groups[changed].append(product)
+
+        for fields, group in groups.items():
+            Product.objects.bulk_update(group, [*fields, 'updated_at'], batch_size=BULK_BATCH_SIZE)
+        if groups:
+            # the cached leaderboards show product names
+            expire_seller_cache([seller_profile_id])
+
+    return sum(len(group) for group in groups.values()), errors
+
+
+# reads product edits from an uploaded csv with an id column and any of name, price, stock
+def read_product_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    fields = {field.strip().lower() for field in reader.fieldnames or []}
+    if 'id' not in fields:
+        raise ValueError("The CSV needs an 'id' column.")
+    if not fields & set(EDITABLE_PRODUCT_FIELDS):
+        raise ValueError("The CSV needs at least one of the name, price or stock columns.")
+    rows = []
+    # line 1 is the header
+    for line, row in enumerate(reader, 2):
+        row = {(key or '').strip().lower(): value for key, value in row.items()}
+        rows.append((f"Line {line}", row))
+    return rows
+
+
+# adds returned quantities back to product stock, one UPDATE per batch of products
+# quantities maps product id to the number of units to return
+def restore_stock(quantities):
+    quantities = {product_id: qty for product_id, qty in quantities.items() if qty}
+    product_ids = sorted(quantities)
+    now = timezone.now()
+    for start in range(0, len(product_ids), BULK_BATCH_SIZE):
+        batch = product_ids[start:start + BULK_BATCH_SIZE]
+        returned = Case(
+            *[When(id=product_id, then=Value(quantities[product_id])) for product_id in batch],
+            default=Value(0),
+        )
+        Product.objects.filter(id__in=batch).update(stock=F('stock') + returned, updated_at=now)
+
+
+# units per product in an order queryset
+def quantities_by_product(orders):
+    return dict(orders.values('product_id').annotate(
+        total=Sum('quantity')).values_list('product_id', 'total'))
+
+
+# moves open orders forward one step, optionally only the ones whose next status is target
+# returns the number of orders changed, orders that cannot make the move are left alone
+def transition_orders(orders, target=None):
+    orders = orders.filter(cancelled=False, done=False)
+    moves = [(source, dest) for source, dest in Order.STATUS_TRANSITIONS.items()
+             if target is None or dest == target]
+    changed = 0
+    with transaction.atomic():
+        # one UPDATE per source status, latest status first so no order moves twice
+        for source, dest in reversed(moves):
+            changed += orders.filter(status=source).update(status=dest)
+    return changed
+
+
+# marks delivered orders as done, adds their revenue to the sales counters and
+# takes their beads out of the open bead demand
+def complete_orders(orders):
+    with transaction.atomic():
+        order_ids = list(orders.select_for_update(of=('self',)).filter(
+            status='delivered', done=False, cancelled=False).values_list('id', flat=True))
+        if not order_ids:
+            return 0
+        to_complete = Order.objects.filter(id__in=order_ids)
+        remove_open_orders(to_complete)
+        completed = to_complete.update(done=True, delivered_at=timezone.now())
+        record_completed(to_complete)
+    return completed
+
+
+# cancels open orders, returns their stock and takes them out of the sales counters
+def cancel_orders(orders, reason):
+    with transaction.atomic():
+        open_orders = orders.select_for_update(of=('self',)).filter(cancelled=False, done=False)
+        order_ids = list(open_orders.values_list('id', flat=True))
+        if not order_ids:
+            return 0
+        to_cancel = Order.objects.filter(id__in=order_ids)
+        quantities = quantities_by_product(to_cancel)
+        record_cancelled(to_cancel)
+        remove_open_orders(to_cancel)
+        cancelled = to_cancel.update(cancelled=True, cancel_reason=reason)
+        restore_stock(quantities)
+    return cancelled
+
+
+# cancels 'waiting' orders older than the payment hold and returns their stock, batch by batch
+# safe to run repeatedly and from several workers, returns the number of orders cancelled
+def expire_unpaid_orders(batch_size=BULK_BATCH_SIZE, now=None):
+    hold = timedelta(hours=getattr(settings, 'ORDER_PAYMENT_HOLD_HOURS', 48))
+    cutoff = (now or timezone.now()) - hold
+    expired = 0
+    while True:
+        with transaction.atomic():
+            # workers on databases with row locks skip batches another worker is handling
+            batch = list(Order.objects.select_for_update(skip_locked=True).filter(
+                status='waiting', cancelled=False, created_at__lt=cutoff,
+            ).order_by('created_at').values_list('id', flat=True)[:batch_size])
+            if not batch:
+                break
+            cancelled = cancel_orders(
+                Order.objects.filter(id__in=batch, status='waiting'), EXPIRED_CANCEL_REASON)
+        expired += cancelled
+        if not cancelled:
+            break
+    return expired
@@ -0,0 +1,6 @@
+# template context processors for the shop application
+
+
+# exposes the role resolved by RoleMiddleware to templates
+def role(request):
+    return {'is_seller': getattr(request, 'is_seller', False)}
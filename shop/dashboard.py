@@ -0,0 +1,149 @@
+# seller dashboard aggregates, shared by the dashboard page and its json data endpoint
+
+import asyncio
+import datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .archive import archived_totals
+from .leaderboards import top_designs, top_products
+from .models import ArchivedOrderRollup, Order
+from .seller_cache import cached_for_seller
+
+# order states counted by the dashboard
+COMPLETED = Q(done=True, cancelled=False)
+CANCELLED = Q(cancelled=True)
+
+
+# order counts and earnings, named apart from the order fields they filter on
+def _aggregates():
+    return {
+        'orders_total': Count('id'),
+        'completed_total': Count('id', filter=COMPLETED),
+        'cancelled_total': Count('id', filter=CANCELLED),
+        'earnings_total': Sum('line_total', filter=COMPLETED),
+    }
+
+
+# order counts and earnings of a seller, live and archived orders together
+def order_totals(seller_profile_id):
+    live = Order.objects.filter(seller_id=seller_profile_id).aggregate(**_aggregates())
+    archived = archived_totals(seller_profile_id)
+    totals = {key: (live[f'{key}_total'] or 0) + archived[key] for key in archived}
+    totals['earnings'] = Decimal(totals['earnings']).quantize(Decimal('0.01'))
+    totals['avg_order_value'] = (
+        (totals['earnings'] / totals['completed']).quantize(Decimal('0.01'))
+        if totals['completed'] else Decimal('0.00'))
+    return totals
+
+
+# per-day orders, completions, cancellations and earnings from start to end, one GROUP BY query
+def daily_series(seller_profile_id, start, end):
+    window_start = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
+    window_end = timezone.make_aware(datetime.datetime.combine(
+        end + datetime.timedelta(days=1), datetime.time.min))
+    rows = (
+        Order.objects.filter(seller_id=seller_profile_id,
+                             created_at__gte=window_start, created_at__lt=window_end)
+        .annotate(day=TruncDate('created_at')).values('day')
+        .annotate(**_aggregates())
+        .order_by()
+    )
+    live = {row['day']: row for row in rows}
+    archived = {
+        rollup.day: rollup for rollup in ArchivedOrderRollup.objects.filter(
+            seller_id=seller_profile_id, day__gte=start, day__lte=end)
+    }
+
+    series = []
+    for offset in range((end - start).days + 1):
+        day = start + datetime.timedelta(days=offset)
+        row, rollup = live.get(day, {}), archived.get(day)
+        point = {'day': day.isoformat()}
+        for key in ('orders', 'completed', 'cancelled', 'earnings'):
+            point[key] = (row.get(f'{key}_total') or 0) + (getattr(rollup, key) if rollup else 0)
+        series.append(point)
+    return series
+
+
+# per-hour orders, completions, cancellations and earnings of one day, one GROUP BY query
+def hourly_series(seller_profile_id, day):
+    day_start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    rows = (
+        Order.objects.filter(seller_id=seller_profile_id, created_at__gte=day_start,
+                             created_at__lt=day_start + datetime.timedelta(days=1))
+        .annotate(hour=ExtractHour('created_at')).values('hour')
+        .annotate(**_aggregates())
+        .order_by()
+    )
+    live = {row['hour']: row for row in rows}
+    return [
+        {'hour': hour, **{key: live.get(hour, {}).get(f'{key}_total') or 0
+                          for key in ('orders', 'completed', 'cancelled', 'earnings')}}
+        for hour in range(24)
+    ]
+
+
+# first day with an order and first day with a completed order, live and archived orders
+# together, None when the seller has none
+def first_order_days(seller_profile_id):
+    live = Order.objects.filter(seller_id=seller_profile_id).aggregate(
+        orders=Min('created_at'), completed=Min('created_at', filter=COMPLETED))
+    archived = ArchivedOrderRollup.objects.filter(seller_id=seller_profile_id).aggregate(
+        orders=Min('day'), completed=Min('day', filter=Q(completed__gt=0)))
+    return {
+        key: min((day for day in (live[key] and timezone.localdate(live[key]), archived[key]) if day),
+                 default=None)
+        for key in ('orders', 'completed')
+    }
+
+
+# the aggregates above and the seller's leaderboards, cached in the seller's namespace
+# until one of their orders is placed, completed or cancelled
+def cached_order_totals(seller_profile_id):
+    return cached_for_seller(seller_profile_id, 'order-totals', lambda: order_totals(seller_profile_id))
+
+
+def cached_daily_series(seller_profile_id, start, end):
+    return cached_for_seller(seller_profile_id, f'daily-series:{start}:{end}',
+                             lambda: daily_series(seller_profile_id, start, end))
+
+
+def cached_hourly_series(seller_profile_id, day):
+    return cached_for_seller(seller_profile_id, f'hourly-series:{day}',
+                             lambda: hourly_series(seller_profile_id, day))
+
+
+def cached_first_order_days(seller_profile_id):
+    return cached_for_seller(seller_profile_id, 'first-order-days',
+                             lambda: first_order_days(seller_profile_id))
+
+
+def cached_top_products(seller_profile_id, days=None, limit=5):
+    return cached_for_seller(seller_profile_id, f'top-products:{days}:{limit}',
+                             lambda: top_products(seller_profile_id, days=days, limit=limit))
+
+
+def cached_top_designs(seller_profile_id, days=None, limit=5):
+    return cached_for_seller(seller_profile_id, f'top-designs:{days}:{limit}',
+                             lambda: top_designs(seller_profile_id, days=days, limit=limit))
+
+
+# runs blocking functions at the same time, each in its own thread with its own database
+# connection, and returns their results in order
+async def gather_in_threads(*funcs):
+    def isolated(func):
+        def run():
+            try:
+                return func()
+            finally:
+                # pool threads outlive the request, so their connections are closed here
+                connections.close_all()
+        return sync_to_async(run, thread_sensitive=False)()
+
+    return await asyncio.gather(*(isolated(func) for func in funcs))
@@ -0,0 +1,91 @@
+# streaming csv and jsonl exports of orders and designs
+
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+
+# rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# columns of the orders export
+ORDER_FIELDS = [
+    'id', 'created_at', 'customer__username', 'product_id', 'product__name',
+    'unit_price', 'quantity', 'line_total', 'payment_type', 'status', 'done',
+    'delivered_at', 'cancelled', 'cancel_reason',
+]
+
+# columns of the designs export
+DESIGN_FIELDS = ['id', 'name', 'customer__username', 'created_at', 'beads']
+
+# columns of the bead demand export, the bead type and how many are needed
+BEAD_DEMAND_FIELDS = ['shape', 'color', 'size', 'letter', 'beads']
+
+
+# file-like object that hands back what csv.writer writes, instead of storing it
+class Echo:
+    def write(self, value):
+        return value
+
+
+# rows of an orders queryset, oldest first, without loading model instances
+def order_rows(qs):
+    return qs.order_by('id').values_list(*ORDER_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+# rows of a designs queryset, oldest first
+def design_rows(qs):
+    return qs.order_by('id').values_list(*DESIGN_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+# bead demand counters summed per bead type, the rows are few so no chunking is needed
+def bead_demand_rows(qs):
+    return (
+        qs.values_list(*BEAD_DEMAND_FIELDS[:-1]).annotate(beads=Sum('count'))
+        .filter(beads__gt=0).order_by(*BEAD_DEMAND_FIELDS[:-1])
+    )
+
+
+# yields csv lines, starting with the header
+def stream_csv(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(
+            json.dumps(value) if isinstance(value, (list, dict)) else value for value in row)
+
+
+# yields one json object per line
+def stream_jsonl(fields, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+# yields the export of a queryset in the given format
+def stream_export(kind, qs, fmt):
+    if kind == 'designs':
+        fields, rows = DESIGN_FIELDS, design_rows(qs)
+    elif kind == 'bead-demand':
+        fields, rows = BEAD_DEMAND_FIELDS, bead_demand_rows(qs)
+    else:
+        fields, rows = ORDER_FIELDS, order_rows(qs)
+    if fmt == 'jsonl':
+        return stream_jsonl(fields, rows)
+    return stream_csv(fields, rows)
+
+
+# the same export as an async iterator, for responses served by the ASGI handler, which would
+# otherwise read a sync stream into memory before sending it
+# every hop to the worker thread fetches and formats one chunk of rows
+async def astream_export(kind, qs, fmt):
+    lines = stream_export(kind, qs, fmt)
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, EXPORT_CHUNK_SIZE)))
+    try:
+        while chunk := await next_chunk():
+            yield chunk
+    finally:
+        # closes the database cursor when the client goes away mid-download
+        await sync_to_async(lines.close)()
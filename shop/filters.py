@@ -0,0 +1,52 @@
+# shared filters for the seller's order list and exports
+
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+# turns a yyyy-mm-dd string into a date, None when it is empty or not a date
+def parse_day(value):
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+# turns a date string into the start of that day in the current timezone
+def _day_start(value):
+    day = parse_day(value)
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+# applies the status, cancelled and date range filters to an order queryset
+def filter_orders(qs, params):
+    status = params.get('status') or ''
+    cancelled = params.get('cancelled') or ''  # 'yes' / 'no' / ''
+    date_from = params.get('date_from') or ''
+    date_to = params.get('date_to') or ''
+
+    if status:
+        qs = qs.filter(status=status)
+    if cancelled == 'yes':
+        qs = qs.filter(cancelled=True)
+    elif cancelled == 'no':
+        qs = qs.filter(cancelled=False)
+
+    # compare against day boundaries so the created_at index can be used
+    start = _day_start(date_from)
+    if start:
+        qs = qs.filter(created_at__gte=start)
+    end = _day_start(date_to)
+    if end:
+        qs = qs.filter(created_at__lt=end + datetime.timedelta(days=1))
+
+    return qs, {
+        'status': status,
+        'cancelled': cancelled,
+        'date_from': date_from if start else '',
+        'date_to': date_to if end else '',
+    }
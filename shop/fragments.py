@@ -0,0 +1,90 @@
+# per-object template fragment caching for catalog and design cards
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# cache key of one rendered card
+FRAGMENT_KEY = 'frag:{template}:{revision}:{variant}:{pk}:{version}'
+
+# revision of each card template, bump it when the template changes so cards rendered
+# with the old markup are not served after a deploy
+TEMPLATE_REVISIONS = {
+    'shop/partials/product_card.html': 1,
+    'shop/partials/design_card.html': 2,
+    'shop/partials/my_design_card.html': 2,
+}
+
+
+# version of an object's card, changes whenever the row is saved or a related value
+# shown on the card changes
+def fragment_version(updated_at, related=()):
+    version = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    if related:
+        digest = hashlib.md5(repr(tuple(related)).encode(), usedforsecurity=False).hexdigest()
+        return f'{version}-{digest[:12]}'
+    return version
+
+
+# cache key of every card, from (pk, updated_at, *related values) rows
+def _fragment_keys(template_name, variant, versions):
+    revision = TEMPLATE_REVISIONS.get(template_name, 1)
+    return {
+        pk: FRAGMENT_KEY.format(template=template_name, revision=revision, variant=variant,
+                                pk=pk, version=fragment_version(updated_at, related))
+        for pk, updated_at, *related in versions
+    }
+
+
+# renders the cards of objects that were not in the cache, keyed by cache key
+def _render_cards(template_name, objects, keys, context_name, extra_context):
+    fresh = {}
+    for obj in objects:
+        context = dict(extra_context or {})
+        context[context_name] = obj
+        fresh[keys[obj.pk]] = render_to_string(template_name, context)
+    return fresh
+
+
+def _timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 86400)
+
+
+# renders one card per object in queryset order, reusing cached cards where possible
+# related_fields are lookups of related values the card shows, e.g. 'customer__username'
+def render_fragments(template_name, queryset, context_name, variant='', extra_context=None,
+                     related_fields=()):
+    # only ids and versions are needed to build the keys
+    versions = list(queryset.values_list('pk', 'updated_at', *related_fields))
+    keys = _fragment_keys(template_name, variant, versions)
+    cached = cache.get_many(keys.values())
+
+    # load and render only the objects whose card is not cached
+    missing = [pk for pk, key in keys.items() if key not in cached]
+    if missing:
+        fresh = _render_cards(template_name, queryset.filter(pk__in=missing),
+                              keys, context_name, extra_context)
+        cache.set_many(fresh, _timeout())
+        cached.update(fresh)
+
+    return [mark_safe(cached[keys[pk]]) for pk, *_ in versions if keys[pk] in cached]
+
+
+# async version of render_fragments for async views, the cards must not need extra queries
+async def arender_fragments(template_name, queryset, context_name, variant='', extra_context=None,
+                            related_fields=()):
+    versions = [row async for row in queryset.values_list('pk', 'updated_at', *related_fields)]
+    keys = _fragment_keys(template_name, variant, versions)
+    cached = await cache.aget_many(keys.values())
+
+    missing = [pk for pk, key in keys.items() if key not in cached]
+    if missing:
+        objects = [obj async for obj in queryset.filter(pk__in=missing)]
+        fresh = _render_cards(template_name, objects, keys, context_name, extra_context)
+        await cache.aset_many(fresh, _timeout())
+        cached.update(fresh)
+
+    return [mark_safe(cached[keys[pk]]) for pk, *_ in versions if keys[pk] in cached]
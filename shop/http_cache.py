@@ -0,0 +1,150 @@
+# cache validators for public read-only pages, so unchanged pages answer 304
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .leaderboards import POPULAR_DESIGNS_DAYS, window_start
+from .models import CustomBraceletDesign, DesignDailySales, Product
+
+
+# django's condition decorator for async views, the validators query the database
+# so they run together in one worker thread before the view
+def acondition(etag_func=None, last_modified_func=None):
+    def decorator(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            def validators():
+                etag = etag_func(request, *args, **kwargs) if etag_func else None
+                last_modified = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+                return etag, last_modified
+
+            etag, last_modified = await sync_to_async(validators)()
+            etag = quote_etag(etag) if etag is not None else None
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+# who the page is rendered for, since the navbar differs per user and role
+def viewer_key(request):
+    if not request.user.is_authenticated:
+        return 'anon'
+    return f"{'seller' if request.is_seller else 'customer'}:{request.user.pk}"
+
+
+# pending flash messages are rendered into the page, so such pages are never validated
+def has_pending_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+# builds a strong etag from the parts that affect a page
+def make_etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+# returns (count, last change) for a queryset with one aggregate query, memoized per request
+def queryset_state(request, name, queryset):
+    states = request.__dict__.setdefault('_page_states', {})
+    if name not in states:
+        result = queryset.aggregate(count=Count('id'), last=Max('updated_at'))
+        states[name] = (result['count'], result['last'])
+    return states[name]
+
+
+# products listed in the catalog
+def catalog_queryset():
+    return Product.objects.exclude(name__startswith='Custom:')
+
+
+def catalog_etag(request):
+    if has_pending_messages(request):
+        return None
+    count, last = queryset_state(request, 'catalog', catalog_queryset())
+    return make_etag('catalog', viewer_key(request), count, last)
+
+
+def catalog_last_modified(request):
+    if has_pending_messages(request):
+        return None
+    return queryset_state(request, 'catalog', catalog_queryset())[1]
+
+
+# designs shown in the public gallery, customers do not see their own
+def public_designs_queryset(request):
+    designs = CustomBraceletDesign.objects.all()
+    if not request.is_seller:
+        designs = designs.exclude(customer=request.user)
+    return designs
+
+
+# gallery order picked with ?sort=, newest first unless 'popular'
+def public_designs_sort(request):
+    return 'popular' if request.GET.get('sort') == 'popular' else 'newest'
+
+
+# (counter rows, orders) of the popularity window, changes whenever the popular order can change
+def popularity_state(request):
+    states = request.__dict__.setdefault('_page_states', {})
+    if 'popularity' not in states:
+        result = DesignDailySales.objects.filter(
+            day__gte=window_start(POPULAR_DESIGNS_DAYS)).aggregate(rows=Count('id'), orders=Sum('orders'))
+        states['popularity'] = (window_start(POPULAR_DESIGNS_DAYS), result['rows'], result['orders'])
+    return states['popularity']
+
+
+def public_designs_etag(request):
+    if not request.user.is_authenticated or has_pending_messages(request):
+        return None
+    count, last = queryset_state(request, 'designs', public_designs_queryset(request))
+    sort = public_designs_sort(request)
+    popularity = popularity_state(request) if sort == 'popular' else ''
+    return make_etag('designs', viewer_key(request), count, last, sort, popularity)
+
+
+def public_designs_last_modified(request):
+    if not request.user.is_authenticated or has_pending_messages(request):
+        return None
+    # new orders reorder the popular list without changing any design
+    if public_designs_sort(request) == 'popular':
+        return None
+    return queryset_state(request, 'designs', public_designs_queryset(request))[1]
+
+
+# last change of a single design, memoized per request
+def design_updated_at(request, design_id):
+    states = request.__dict__.setdefault('_page_states', {})
+    key = f'design:{design_id}'
+    if key not in states:
+        states[key] = CustomBraceletDesign.objects.filter(
+            id=design_id).values_list('updated_at', flat=True).first()
+    return states[key]
+
+
+def design_detail_etag(request, design_id):
+    if has_pending_messages(request):
+        return None
+    updated_at = design_updated_at(request, design_id)
+    if updated_at is None:
+        return None
+    return make_etag('design', design_id, viewer_key(request), updated_at)
+
+
+def design_detail_last_modified(request, design_id):
+    if has_pending_messages(request):
+        return None
+    return design_updated_at(request, design_id)
@@ -0,0 +1,130 @@
+# per-day sales counters for products and designs, and the leaderboards read from them
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from .models import DesignDailySales, ProductDailySales
+from .seller_cache import expire_seller_cache
+
+# order columns the counters are computed from
+ORDER_VALUES = ('product_id', 'seller_id', 'custom_design_id', 'created_at', 'quantity', 'line_total', 'done')
+
+# days counted when the design gallery is sorted by popularity
+POPULAR_DESIGNS_DAYS = 30
+
+
+# counts newly placed orders
+def record_placed(orders):
+    _record(orders, lambda row: {'orders': 1, 'units': row['quantity']})
+
+
+# adds the revenue of orders that were just marked as done
+def record_completed(orders):
+    _record(orders, lambda row: {'revenue': row['line_total'] or Decimal('0.00')})
+
+
+# takes cancelled orders back out of the counters, call it before the orders are saved as cancelled
+def record_cancelled(orders):
+    _record(orders, lambda row: {
+        'orders': -1,
+        'units': -row['quantity'],
+        'revenue': -(row['line_total'] or Decimal('0.00')) if row['done'] else Decimal('0.00'),
+    })
+
+
+# order values from a queryset or from a list of Order objects
+def _order_rows(orders):
+    if isinstance(orders, QuerySet):
+        return orders.values(*ORDER_VALUES)
+    return [{field: getattr(order, field) for field in ORDER_VALUES} for order in orders]
+
+
+# sums the change of every order per product day and design seller day, then writes one
+# UPDATE per counter row and expires the cached dashboards of the sellers involved
+def _record(orders, change):
+    totals = defaultdict(lambda: defaultdict(int))
+    sellers = set()
+    for row in _order_rows(orders):
+        day = timezone.localdate(row['created_at'])
+        delta = change(row)
+        keys = [(ProductDailySales, (('product_id', row['product_id']),))]
+        # orders without a seller predate backfill_order_sellers and have no design counter, a NULL
+        # seller never clashes on the unique constraint so every change would add another row
+        if row['custom_design_id'] and row['seller_id']:
+            keys.append((DesignDailySales, (('design_id', row['custom_design_id']),
+                                            ('seller_id', row['seller_id']))))
+        for model, lookup in keys:
+            for name, value in delta.items():
+                totals[(model, lookup, day)][name] += value
+        sellers.add(row['seller_id'])
+
+    for (model, lookup, day), delta in totals.items():
+        delta = {name: value for name, value in delta.items() if value}
+        if delta:
+            bump_counter(model, {**dict(lookup), 'day': day}, delta)
+    expire_seller_cache(sellers)
+
+
+# adds delta to one counter row, creating the row on its first change
+def bump_counter(model, lookup, delta):
+    increments = {name: F(name) + Value(value) for name, value in delta.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **delta)
+    except IntegrityError:
+        # another request created the row first
+        model.objects.filter(**lookup).update(**increments)
+
+
+# first day of a window of the last `days` days, None for all time
+def window_start(days):
+    return timezone.localdate() - timedelta(days=days - 1) if days else None
+
+
+# best selling catalog products of a seller, by units, orders or revenue
+def top_products(seller_profile_id, days=None, limit=5, by='units'):
+    rows = ProductDailySales.objects.filter(
+        product__created_by_id=seller_profile_id).exclude(product__name__startswith='Custom:')
+    if days:
+        rows = rows.filter(day__gte=window_start(days))
+    return list(
+        rows.values('product_id', 'product__name')
+        .annotate(units=Sum('units'), orders=Sum('orders'), revenue=Sum('revenue'))
+        .filter(**{f'{by}__gt': 0})
+        .order_by(f'-{by}', 'product_id')[:limit]
+    )
+
+
+# most ordered custom bracelet designs, by orders, units or revenue, of one seller or of all
+def top_designs(seller_profile_id=None, days=None, limit=5, by='orders'):
+    rows = DesignDailySales.objects.all()
+    if seller_profile_id:
+        rows = rows.filter(seller_id=seller_profile_id)
+    if days:
+        rows = rows.filter(day__gte=window_start(days))
+    return list(
+        rows.values('design_id', 'design__name')
+        .annotate(units=Sum('units'), orders=Sum('orders'), revenue=Sum('revenue'))
+        .filter(**{f'{by}__gt': 0})
+        .order_by(f'-{by}', 'design_id')[:limit]
+    )
+
+
+# sorts a design queryset by the number of orders placed in the last `days` days
+def order_by_popularity(designs, days=POPULAR_DESIGNS_DAYS):
+    recent_orders = (
+        DesignDailySales.objects.filter(design=OuterRef('pk'), day__gte=window_start(days))
+        .values('design').annotate(total=Sum('orders')).values('total')
+    )
+    return designs.annotate(
+        recent_orders=Coalesce(Subquery(recent_orders), 0)
+    ).order_by('-recent_orders', '-created_at')
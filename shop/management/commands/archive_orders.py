@@ -0,0 +1,20 @@
+# management command that moves old finished orders into the archive tables
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.archive import ARCHIVE_BATCH_SIZE, archive_orders
+
+
+class Command(BaseCommand):
+    help = "Moves done and cancelled orders older than --days into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=180,
+                            help="Archive orders placed more than DAYS days ago (default 180).")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1.")
+        archived = archive_orders(options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} order(s)."))
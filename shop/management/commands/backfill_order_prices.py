@@ -0,0 +1,32 @@
+# management command that fills the price snapshot of orders placed before it existed
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+
+from shop.models import Order, Product
+
+# orders updated per transaction
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Sets unit_price and line_total on orders that have no price snapshot yet."
+
+    def handle(self, *args, **options):
+        current_price = Subquery(Product.objects.filter(id=OuterRef('product_id')).values('price')[:1])
+        line_total = ExpressionWrapper(
+            F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+        total = 0
+        while True:
+            batch = list(Order.objects.filter(unit_price__isnull=True).order_by('id')
+                         .values_list('id', flat=True)[:BATCH_SIZE])
+            if not batch:
+                break
+            with transaction.atomic():
+                # older orders never stored a price, so the current product price is the best guess
+                Order.objects.filter(id__in=batch).update(unit_price=current_price)
+                Order.objects.filter(id__in=batch).update(line_total=line_total)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} order(s)."))
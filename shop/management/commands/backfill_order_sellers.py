@@ -0,0 +1,29 @@
+# management command that fills the seller of orders placed before orders stored it
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from shop.models import ArchivedOrder, Order, Product
+
+# orders updated per transaction
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = ("Sets the seller of live and archived orders that have none, from the seller of the "
+            "ordered product. Run rebuild_leaderboards and rebuild_bead_demand afterwards.")
+
+    def handle(self, *args, **options):
+        product_seller = Subquery(Product.objects.filter(id=OuterRef('product_id')).values('created_by_id')[:1])
+        for model in (Order, ArchivedOrder):
+            total = 0
+            while True:
+                batch = list(model.objects.filter(seller__isnull=True).order_by('id')
+                             .values_list('id', flat=True)[:BATCH_SIZE])
+                if not batch:
+                    break
+                with transaction.atomic():
+                    model.objects.filter(id__in=batch).update(seller_id=product_seller)
+                total += len(batch)
+            self.stdout.write(self.style.SUCCESS(f"Backfilled {total} {model._meta.verbose_name}(s)."))
@@ -0,0 +1,227 @@
+# management command that compares how much concurrency one WSGI worker and one ASGI worker sustain
+
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+
+from shop.models import CustomBraceletDesign, SellerProfile
+from shop.profiling import percentile
+
+
+class Command(BaseCommand):
+    help = ("Sends the read-heavy pages through the WSGI and ASGI handlers in-process, at several "
+            "client concurrency levels, and reports throughput and latency for one worker of each.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer', help="Customer username to browse as, defaults to the first customer.")
+        parser.add_argument('--seller', help="Seller username for the dashboard data, defaults to the first seller.")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per mode and concurrency level.")
+        parser.add_argument('--concurrency', default='1,8,32',
+                            help="Comma separated numbers of concurrent clients.")
+        parser.add_argument('--threads', type=int, default=4,
+                            help="Request threads of the WSGI worker, like gunicorn --threads.")
+        parser.add_argument('--json', action='store_true', help="Print the results as json.")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma separated list of numbers.")
+        if not levels or min(levels) < 1 or options['requests'] < 1 or options['threads'] < 1:
+            raise CommandError("Concurrency, requests and threads must be positive.")
+
+        self.host = next((host for host in settings.ALLOWED_HOSTS
+                          if host and '*' not in host and not host.startswith('.')), 'localhost')
+        self.targets = self.build_targets(options)
+        self.wsgi_app = get_wsgi_application()
+        self.asgi_app = get_asgi_application()
+
+        # one untimed pass fills the template, fragment and role caches
+        for path, cookie in self.targets:
+            self.wsgi_request(path, cookie)
+
+        results = []
+        for level in levels:
+            results.append(self.run_wsgi(level, options['requests'], options['threads']))
+            results.append(asyncio.run(self.run_asgi(level, options['requests'])))
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'threads': options['threads'],
+                'paths': [path for path, _ in self.targets],
+                'results': results,
+            }, indent=2))
+            return
+        self.stdout.write(f"{'mode':<6}{'clients':>8}{'requests':>10}{'errors':>8}"
+                          f"{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+        for row in results:
+            self.stdout.write(f"{row['mode']:<6}{row['concurrency']:>8}{row['requests']:>10}{row['errors']:>8}"
+                              f"{row['rps']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['max_ms']:>9.1f}")
+
+    # (path, cookie header) pairs the clients cycle through
+    def build_targets(self, options):
+        customers = User.objects.filter(sellerprofile__isnull=True, is_active=True)
+        customer = (customers.filter(username=options['customer']) if options['customer']
+                    else customers.order_by('id')).first()
+        sellers = SellerProfile.objects.select_related('user')
+        seller = (sellers.filter(user__username=options['seller']) if options['seller']
+                  else sellers.order_by('id')).first()
+        if customer is None or seller is None:
+            raise CommandError("A customer and a seller account are needed.")
+
+        customer_cookie = self.session_cookie(customer)
+        targets = [
+            ('/catalog/', customer_cookie),
+            ('/designs/', customer_cookie),
+            ('/orders/', customer_cookie),
+            ('/seller/dashboard/data/', self.session_cookie(seller.user)),
+        ]
+        design_id = CustomBraceletDesign.objects.order_by('-id').values_list('id', flat=True).first()
+        if design_id:
+            targets.append((f'/customize/{design_id}/', customer_cookie))
+        return targets
+
+    # logs the user in through the session store and returns the cookie header
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    # sends one GET through the WSGI handler, returns the status code
+    def wsgi_request(self, path, cookie):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'HTTP_COOKIE': cookie,
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(b''),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        status = []
+        body = self.wsgi_app(environ, lambda line, headers, exc_info=None: status.append(line))
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return int(status[0].split()[0])
+
+    # sends one GET through the ASGI handler, returns the status code
+    async def asgi_request(self, path, cookie):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', self.host.encode()), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+        sent_body = False
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # the client stays connected, django stops listening once the response is sent
+            await asyncio.Future()
+
+        status = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.asgi_app(scope, receive, send)
+        return status[0]
+
+    # clients wait for one of the worker's threads, like requests queued on a threaded worker
+    def run_wsgi(self, concurrency, total, threads):
+        latencies, errors = [], []
+        paths = cycle(self.targets)
+        with ThreadPoolExecutor(max_workers=threads) as worker, \
+                ThreadPoolExecutor(max_workers=concurrency) as clients:
+            def client(count):
+                for _ in range(count):
+                    path, cookie = next(paths)
+                    started = time.perf_counter()
+                    try:
+                        status = worker.submit(self.wsgi_request, path, cookie).result()
+                    except Exception:
+                        status = 500
+                    latencies.append(time.perf_counter() - started)
+                    if status >= 400:
+                        errors.append(path)
+
+            started = time.perf_counter()
+            list(clients.map(client, self.split(total, concurrency)))
+            elapsed = time.perf_counter() - started
+        return self.summary('wsgi', concurrency, latencies, errors, elapsed)
+
+    # all clients share one event loop, like a single ASGI worker process
+    async def run_asgi(self, concurrency, total):
+        latencies, errors = [], []
+        paths = cycle(self.targets)
+
+        async def client(count):
+            for _ in range(count):
+                path, cookie = next(paths)
+                started = time.perf_counter()
+                try:
+                    status = await self.asgi_request(path, cookie)
+                except Exception:
+                    status = 500
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    errors.append(path)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(count) for count in self.split(total, concurrency)))
+        elapsed = time.perf_counter() - started
+        return self.summary('asgi', concurrency, latencies, errors, elapsed)
+
+    # spreads total requests over the clients
+    def split(self, total, clients):
+        return [total // clients + (1 if i < total % clients else 0) for i in range(clients)]
+
+    def summary(self, mode, concurrency, latencies, errors, elapsed):
+        latencies.sort()
+        return {
+            'mode': mode,
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'errors': len(errors),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
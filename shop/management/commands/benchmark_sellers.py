@@ -0,0 +1,163 @@
+# management command that checks one seller's pages stay as fast while other sellers' data grows
+
+import datetime
+import io
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import (setup_databases, setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from django.utils import timezone
+
+from shop.models import Order, Product, SellerProfile
+from shop.profiling import percentile
+
+# seller pages timed at every step
+PAGES = [
+    ('dashboard', '/seller/dashboard/'),
+    ('dashboard_data', '/seller/dashboard/data/?days=30'),
+    ('order_list', '/seller/manage-orders/'),
+    ('order_list_status', '/seller/manage-orders/?status=pending'),
+]
+
+# orders written per INSERT
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ("Builds a temporary test database with one measured seller, then grows the orders of "
+            "other sellers step by step and times the measured seller's dashboard and order list "
+            "at each step, with cold caches. The real database is not touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000, help="Orders of the measured seller.")
+        parser.add_argument('--others', default='0,20000,100000',
+                            help="Comma separated totals of other sellers' orders to measure at.")
+        parser.add_argument('--sellers', type=int, default=5, help="Number of other sellers.")
+        parser.add_argument('--days', type=int, default=60,
+                            help="Past days the orders are spread over, the dashboard charts every one of them.")
+        parser.add_argument('--requests', type=int, default=20, help="Requests per page and step.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed of the generated data.")
+        parser.add_argument('--json', action='store_true', help="Print the results as json.")
+
+    def handle(self, *args, **options):
+        try:
+            steps = [int(step) for step in options['others'].split(',') if step.strip()]
+        except ValueError:
+            raise CommandError("--others must be a comma separated list of numbers.")
+        if not steps or steps != sorted(steps) or steps[0] < 0:
+            raise CommandError("--others must be increasing and not negative.")
+        if min(options['orders'], options['sellers'], options['requests'], options['days']) < 1:
+            raise CommandError("Orders, sellers, requests and days must be positive.")
+        self.days = options['days']
+        self.rng = random.Random(options['seed'])
+        # products and customer of each generated seller, by seller id
+        self.products, self.customers = {}, {}
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = self.run(steps, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'seller_orders': options['orders'],
+                'other_sellers': options['sellers'],
+                'history_days': options['days'],
+                'results': results,
+            }, indent=2))
+            return
+        self.stdout.write(f"{'other orders':>13}  {'page':<18}{'p50 ms':>9}{'p95 ms':>9}{'vs first':>10}")
+        for row in results:
+            self.stdout.write(f"{row['other_orders']:>13}  {row['page']:<18}{row['p50_ms']:>9.1f}"
+                              f"{row['p95_ms']:>9.1f}{row['p50_ratio']:>9.2f}x")
+
+    def run(self, steps, options):
+        seller = self.create_seller('measured-seller')
+        self.create_orders([seller], options['orders'])
+        others = [self.create_seller(f'other-seller-{number}') for number in range(options['sellers'])]
+        client = Client()
+        client.force_login(seller.user)
+
+        results, first = [], {}
+        other_orders = 0
+        for step in steps:
+            self.create_orders(others, step - other_orders)
+            other_orders = step
+            for page, path in PAGES:
+                latencies = self.time_page(client, path, options['requests'])
+                p50 = percentile(latencies, 50) * 1000
+                first.setdefault(page, p50)
+                results.append({
+                    'other_orders': other_orders,
+                    'page': page,
+                    'p50_ms': round(p50, 1),
+                    'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+                    'p50_ratio': round(p50 / first[page], 2) if first[page] else 1.0,
+                })
+        return results
+
+    # sorted request times of one page, every request starts with empty caches
+    def time_page(self, client, path, requests):
+        # compiles the templates and warms the connection before timing
+        client.get(path)
+        latencies = []
+        for _ in range(requests):
+            cache.clear()
+            started = time.perf_counter()
+            response = client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f"{path} answered {response.status_code}.")
+        return sorted(latencies)
+
+    def create_seller(self, username):
+        user = User.objects.create_user(username, password=None)
+        seller = SellerProfile.objects.create(user=user)
+        customer = User.objects.create_user(f'{username}-customer', password=None)
+        self.products[seller.id] = [
+            Product.objects.create(name=f'{username} bracelet {number}', price=Decimal('150.00'),
+                                   image='product_images/benchmark.jpg', created_by=seller, stock=1000)
+            for number in range(5)
+        ]
+        self.customers[seller.id] = customer
+        return seller
+
+    # spreads count new orders over the sellers and the last --days days, then rebuilds the
+    # daily sales counters that bulk_create skips, so the leaderboards read real rows
+    def create_orders(self, sellers, count):
+        now = timezone.now()
+        statuses = [value for value, _ in Order.STATUS_CHOICES]
+        with transaction.atomic():
+            for day in range(self.days):
+                day_count = count // self.days + (1 if day < count % self.days else 0)
+                orders = []
+                for _ in range(day_count):
+                    seller = self.rng.choice(sellers)
+                    product = self.rng.choice(self.products[seller.id])
+                    quantity = self.rng.randint(1, 3)
+                    status = self.rng.choice(statuses)
+                    orders.append(Order(
+                        customer=self.customers[seller.id], product=product, seller=seller,
+                        quantity=quantity, unit_price=product.price, line_total=product.price * quantity,
+                        payment_type='gcash', status=status, done=status == 'delivered',
+                        cancelled=status == 'waiting' and self.rng.random() < 0.2,
+                    ))
+                if not orders:
+                    continue
+                created = Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+                # created_at is set to now on insert, so the day is applied afterwards
+                Order.objects.filter(id__gte=created[0].id, id__lte=created[-1].id).update(
+                    created_at=now - datetime.timedelta(days=day))
+        call_command('rebuild_leaderboards', stdout=io.StringIO())
@@ -0,0 +1,25 @@
+# management command that cancels unpaid orders after the payment hold expires
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.bulk import BULK_BATCH_SIZE, expire_unpaid_orders
+
+
+class Command(BaseCommand):
+    help = "Cancels orders still waiting for payment after ORDER_PAYMENT_HOLD_HOURS and returns their stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep sweeping every INTERVAL seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_unpaid_orders(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Cancelled {expired} expired order(s)."))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,53 @@
+# management command that streams orders or designs to a csv or jsonl file
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.exports import stream_export
+from shop.filters import filter_orders
+from shop.models import CustomBraceletDesign, Order, SellerProfile
+
+
+class Command(BaseCommand):
+    help = "Exports orders (or designs) as csv or jsonl, with the seller order list filters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', help="File to write to, defaults to stdout.")
+        parser.add_argument('--status', choices=[value for value, _ in Order.STATUS_CHOICES])
+        parser.add_argument('--cancelled', choices=['yes', 'no'])
+        parser.add_argument('--date-from', help="First order date to include (YYYY-MM-DD).")
+        parser.add_argument('--date-to', help="Last order date to include (YYYY-MM-DD).")
+        parser.add_argument('--seller', help="Only export orders of this seller's username.")
+        parser.add_argument('--designs', action='store_true',
+                            help="Export custom bracelet designs instead of orders.")
+
+    def handle(self, *args, **options):
+        if options['designs']:
+            kind, qs = 'designs', CustomBraceletDesign.objects.all()
+        else:
+            kind, qs = 'orders', Order.objects.all()
+            if options['seller']:
+                seller = SellerProfile.objects.filter(user__username=options['seller']).first()
+                if seller is None:
+                    raise CommandError(f"No seller named {options['seller']}.")
+                qs = qs.filter(seller=seller)
+            qs, filters = filter_orders(qs, options)
+            for name in ('date_from', 'date_to'):
+                if options[name] and not filters[name]:
+                    raise CommandError(f"Invalid date for --{name.replace('_', '-')}.")
+
+        out = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            rows = 0
+            for chunk in stream_export(kind, qs, options['format']):
+                out.write(chunk)
+                rows += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options['output']:
+            # the csv export starts with a header line
+            count = rows - 1 if options['format'] == 'csv' else rows
+            self.stderr.write(self.style.SUCCESS(f"Exported {count} {kind} to {options['output']}."))
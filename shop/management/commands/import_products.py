@@ -0,0 +1,30 @@
+# management command that applies product edits from a csv file
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.bulk import apply_product_changes, read_product_csv
+from shop.models import SellerProfile
+
+
+class Command(BaseCommand):
+    help = "Updates a seller's product names, prices and stock from a csv with an id column."
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--seller', required=True, help="Username of the seller owning the products.")
+
+    def handle(self, *args, **options):
+        seller = SellerProfile.objects.filter(user__username=options['seller']).first()
+        if seller is None:
+            raise CommandError(f"No seller named {options['seller']}.")
+        try:
+            with open(options['csv_file'], encoding='utf-8-sig') as f:
+                rows = read_product_csv(f.read())
+        except (OSError, UnicodeDecodeError, ValueError) as exc:
+            raise CommandError(f"Could not read {options['csv_file']}: {exc}")
+
+        updated, errors = apply_product_changes(seller.id, rows)
+        for label, error in errors:
+            self.stderr.write(f"{label}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {updated} product(s), {len(errors)} row error(s)."))
@@ -0,0 +1,469 @@
+# management command that replays weighted shopper and seller sessions at rising concurrency and
+# reports throughput, latency, errors and sqlite lock errors per endpoint
+
+import io
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from functools import lru_cache
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connections
+from django.test import Client
+from django.urls import Resolver404, resolve
+from django.utils.crypto import get_random_string
+
+from shop.models import CustomBraceletDesign, Order, Product, SellerProfile
+from shop.profiling import percentile
+
+# how often each journey is picked, overridable with --weights
+DEFAULT_WEIGHTS = {
+    'browse': 45,
+    'order': 10,
+    'chat': 15,
+    'custom': 5,
+    'api': 5,
+    'seller': 20,
+}
+
+
+# a journey that ran past the end of its stage
+class StageOver(Exception):
+    pass
+
+
+# sends requests through the project's WSGI handler in the calling thread, like a threaded server
+class WsgiTransport:
+    def __init__(self, host):
+        self.host = host
+        self.app = get_wsgi_application()
+        self.local = threading.local()
+        got_request_exception.connect(self.on_exception)
+
+    # the handler turns view exceptions into 500 responses, this keeps the exception for the report
+    def on_exception(self, sender, **kwargs):
+        self.local.exception = sys.exc_info()[1]
+
+    def close(self):
+        got_request_exception.disconnect(self.on_exception)
+
+    # returns (status, body, exception raised by the view)
+    def send(self, method, path, body, headers):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace('-', '_')
+            environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+        self.local.exception = None
+        status = []
+        chunks = self.app(environ, lambda line, response_headers, exc_info=None: status.append(line))
+        try:
+            content = b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return int(status[0].split()[0]), content, self.local.exception
+
+
+# sends requests over http to a running server, e.g. runserver or an ASGI server
+class HttpTransport:
+    # redirects are reported as they are instead of being followed
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(self.NoRedirect)
+
+    def close(self):
+        pass
+
+    def send(self, method, path, body, headers):
+        request = urllib.request.Request(
+            self.base_url + path, data=body if method == 'POST' else None, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read(), None
+        except urllib.error.HTTPError as error:
+            return error.code, error.read(), None
+        except OSError as error:
+            # connection refused, reset or timed out
+            return 0, b'', error
+
+
+# timings and outcomes per endpoint, one per client thread so no locking is needed
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.lock_errors = Counter()
+
+    def add(self, endpoint, elapsed, status, locked):
+        self.latencies[endpoint].append(elapsed)
+        self.statuses[endpoint][status] += 1
+        if status == 0 or status >= 400:
+            self.errors[endpoint] += 1
+        if locked:
+            self.lock_errors[endpoint] += 1
+
+    def merge(self, other):
+        for endpoint, values in other.latencies.items():
+            self.latencies[endpoint].extend(values)
+            self.statuses[endpoint].update(other.statuses[endpoint])
+        self.errors.update(other.errors)
+        self.lock_errors.update(other.lock_errors)
+
+
+# endpoint name of a request, the method and url name, e.g. "POST product_order"
+@lru_cache(maxsize=256)
+def endpoint_name(method, path):
+    try:
+        name = resolve(path.partition('?')[0]).url_name
+    except Resolver404:
+        name = path
+    return f"{method} {name}"
+
+
+# one logged-in browser: a customer session, a seller session and its csrf cookie
+class Session:
+    def __init__(self, command, customer, seller_user, rng):
+        self.command = command
+        self.customer = customer
+        self.rng = rng
+        self.csrf_token = get_random_string(32)
+        self.cookies = {
+            'customer': self.cookie_header(command.session_key(customer)),
+            'seller': self.cookie_header(command.session_key(seller_user)),
+        }
+        self.role = 'customer'
+        self.order_ids = []
+        self.stats = Stats()
+        self.deadline = None
+
+    def cookie_header(self, session_key):
+        return (f"{settings.SESSION_COOKIE_NAME}={session_key}; "
+                f"{settings.CSRF_COOKIE_NAME}={self.csrf_token}")
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    # form posts carry the csrf secret, which django accepts in place of a masked token
+    def post(self, path, data):
+        return self.request('POST', path, {**data, 'csrfmiddlewaretoken': self.csrf_token})
+
+    def request(self, method, path, data=None):
+        if time.perf_counter() >= self.deadline:
+            raise StageOver
+        body = urlencode(data).encode() if data else b''
+        headers = {'Cookie': self.cookies[self.role]}
+        if method == 'POST':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        started = time.perf_counter()
+        status, content, exception = self.command.transport.send(method, path, body, headers)
+        elapsed = time.perf_counter() - started
+        locked = (
+            (isinstance(exception, OperationalError) and 'locked' in str(exception))
+            or (status >= 500 and b'database is locked' in content)
+        )
+        self.stats.add(endpoint_name(method, path), elapsed, status, locked)
+        self.think()
+        return status
+
+    # pause between requests, like a person reading the page
+    def think(self):
+        if self.command.think:
+            time.sleep(self.rng.uniform(0, 2 * self.command.think))
+
+    # the customer's latest orders, reloaded after placing new ones
+    def refresh_orders(self):
+        self.order_ids = list(Order.objects.filter(customer=self.customer)
+                              .order_by('-id').values_list('id', flat=True)[:20])
+
+
+class Command(BaseCommand):
+    help = ("Replays weighted customer and seller journeys over the shop's pages with a growing number "
+            "of concurrent users, in-process through the WSGI handler or against a running server with "
+            "--url, and reports throughput, latency percentiles, error rates and sqlite lock errors per "
+            "endpoint. It places real orders and messages, so run it on a copy of the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default='10,50,200',
+                            help="Comma separated concurrent users of each ramp stage.")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds each stage runs.")
+        parser.add_argument('--think', type=float, default=0.0,
+                            help="Mean seconds a user waits between requests.")
+        parser.add_argument('--weights', default='',
+                            help="Journey weights like browse=45,order=10, journeys: "
+                                 + ', '.join(DEFAULT_WEIGHTS) + ".")
+        parser.add_argument('--url', help="Base url of a running server, e.g. http://127.0.0.1:8000. "
+                                          "Without it requests go through the WSGI handler in-process.")
+        parser.add_argument('--seller', help="Seller username, defaults to the first seller.")
+        parser.add_argument('--seed', type=int, help="Random seed, for repeatable journeys.")
+        parser.add_argument('--json', action='store_true', help="Print the report as json.")
+        parser.add_argument('--output', help="Also write the json report to this file.")
+
+    def handle(self, *args, **options):
+        try:
+            stages = [int(users) for users in options['users'].split(',') if users.strip()]
+        except ValueError:
+            raise CommandError("--users must be a comma separated list of numbers.")
+        if not stages or min(stages) < 1 or options['duration'] <= 0 or options['think'] < 0:
+            raise CommandError("Users and duration must be positive.")
+        self.weights = self.parse_weights(options['weights'])
+        self.think = options['think']
+        self.rng = random.Random(options['seed'])
+        self.load_data(options)
+
+        if options['url']:
+            if urlsplit(options['url']).scheme not in ('http', 'https'):
+                raise CommandError("--url must start with http:// or https://.")
+            self.transport = HttpTransport(options['url'])
+        else:
+            host = next((host for host in settings.ALLOWED_HOSTS
+                         if host and '*' not in host and not host.startswith('.')), 'localhost')
+            self.transport = WsgiTransport(host)
+
+        # 500 responses are counted in the report instead of logged with their tracebacks
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            results = [self.run_stage(users, options['duration']) for users in stages]
+        finally:
+            request_logger.setLevel(level)
+            self.transport.close()
+
+        report = {
+            'target': options['url'] or 'wsgi',
+            'duration_s': options['duration'],
+            'think_s': self.think,
+            'weights': self.weights,
+            'seed': options['seed'],
+            'stages': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(results)
+
+    def parse_weights(self, text):
+        weights = dict(DEFAULT_WEIGHTS)
+        for item in filter(None, (part.strip() for part in text.split(','))):
+            name, _, value = item.partition('=')
+            if name not in weights:
+                raise CommandError(f"Unknown journey '{name}'.")
+            try:
+                weights[name] = int(value)
+            except ValueError:
+                raise CommandError(f"Weight of '{name}' must be a number.")
+        if min(weights.values()) < 0 or not sum(weights.values()):
+            raise CommandError("Weights must not be negative and at least one must be positive.")
+        return weights
+
+    # accounts, products, designs and orders the journeys pick from
+    def load_data(self, options):
+        sellers = SellerProfile.objects.select_related('user')
+        self.seller = (sellers.filter(user__username=options['seller']) if options['seller']
+                       else sellers.order_by('id')).first()
+        self.customers = list(User.objects.filter(
+            sellerprofile__isnull=True, is_active=True, is_staff=False).order_by('id'))
+        if self.seller is None or not self.customers:
+            raise CommandError("A seller and at least one customer account are needed.")
+        self.product_ids = list(Product.objects.filter(created_by=self.seller, stock__gt=0)
+                                .exclude(name__startswith='Custom:').values_list('id', flat=True))
+        self.design_ids = list(CustomBraceletDesign.objects.order_by('-id').values_list('id', flat=True)[:200])
+
+    # logs the user in through the session store, every simulated browser gets its own session
+    def session_key(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    # runs the given number of users until the stage time is up and summarizes their requests
+    def run_stage(self, users, duration):
+        # orders placed by the previous stages are worked on by the seller too
+        self.seller_order_ids = list(Order.objects.filter(seller=self.seller)
+                                     .order_by('-id').values_list('id', flat=True)[:200])
+        sessions = []
+        for number in range(users):
+            session = Session(self, self.customers[number % len(self.customers)], self.seller.user,
+                              random.Random(self.rng.random()))
+            session.refresh_orders()
+            sessions.append(session)
+        # the main thread's connection is not used while the clients run
+        connections.close_all()
+
+        started = time.perf_counter()
+        for session in sessions:
+            session.deadline = started + duration
+        threads = [threading.Thread(target=self.run_user, args=(session,)) for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        stats = Stats()
+        for session in sessions:
+            stats.merge(session.stats)
+        return self.summary(users, stats, elapsed)
+
+    # picks weighted journeys until the stage is over
+    def run_user(self, session):
+        names = list(self.weights)
+        weights = [self.weights[name] for name in names]
+        try:
+            while True:
+                journey = session.rng.choices(names, weights)[0]
+                session.role = 'seller' if journey == 'seller' else 'customer'
+                getattr(self, f'journey_{journey}')(session)
+        except StageOver:
+            pass
+        finally:
+            connections.close_all()
+
+    # a customer looking around the shop
+    def journey_browse(self, session):
+        session.get('/')
+        session.get('/catalog/')
+        session.get(f'/catalog/?page={session.rng.randint(1, 3)}')
+        session.get('/designs/')
+        if self.design_ids:
+            session.get(f'/customize/{session.rng.choice(self.design_ids)}/')
+
+    # a customer ordering a catalog product
+    def journey_order(self, session):
+        session.get('/catalog/')
+        if not self.product_ids:
+            return
+        path = f'/catalog/{session.rng.choice(self.product_ids)}/order/'
+        session.get(path)
+        status = session.post(path, {
+            'quantity': 1,
+            'payment_type': session.rng.choice(Order.PAYMENT_CHOICES)[0],
+        })
+        if status == 302:
+            session.refresh_orders()
+        session.get('/orders/')
+
+    # a customer checking an order and messaging the seller
+    def journey_chat(self, session):
+        session.get('/orders/')
+        if not session.order_ids:
+            return
+        path = f'/orders/{session.rng.choice(session.order_ids)}/'
+        session.get(path)
+        session.post(path, {'text': "Hi, any update on my order?"})
+        session.get(path)
+
+    # a customer ordering someone's public design
+    def journey_custom(self, session):
+        session.get('/designs/')
+        if not self.design_ids:
+            return
+        design_id = session.rng.choice(self.design_ids)
+        session.get(f'/customize/{design_id}/')
+        session.get(f'/customize/{design_id}/order/')
+        if session.post(f'/customize/{design_id}/order/',
+                        {'payment_type': 'gcash', 'seller': self.seller.id}) == 302:
+            session.refresh_orders()
+
+    # an app reading the json api
+    def journey_api(self, session):
+        session.get('/api/v1/products/')
+        session.get('/api/v1/designs/')
+        session.get('/api/v1/orders/')
+
+    # the seller working through the dashboard and orders
+    def journey_seller(self, session):
+        session.get('/seller/dashboard/')
+        session.get(f'/seller/dashboard/data/?days={session.rng.choice([7, 30])}')
+        session.get('/seller/manage-orders/')
+        if self.seller_order_ids:
+            path = f'/seller/order/{session.rng.choice(self.seller_order_ids)}/manage/'
+            session.get(path)
+            session.post(path, {'send_message': '1', 'text': "Your bracelet is being made."})
+        session.get('/seller/bead-demand/')
+
+    def summary(self, users, stats, elapsed):
+        endpoints = {}
+        for endpoint in sorted(stats.latencies):
+            latencies = sorted(stats.latencies[endpoint])
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'errors': stats.errors[endpoint],
+                'error_rate': round(stats.errors[endpoint] / len(latencies), 4),
+                'lock_errors': stats.lock_errors[endpoint],
+                'rps': round(len(latencies) / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+                'max_ms': round(latencies[-1] * 1000, 1),
+                'statuses': {str(status): count for status, count in sorted(stats.statuses[endpoint].items())},
+            }
+        latencies = sorted(value for values in stats.latencies.values() for value in values)
+        errors = sum(stats.errors.values())
+        return {
+            'users': users,
+            'elapsed_s': round(elapsed, 2),
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': round(errors / len(latencies), 4) if latencies else 0.0,
+            'lock_errors': sum(stats.lock_errors.values()),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, results):
+        header = (f"{'endpoint':<34}{'requests':>9}{'errors':>8}{'locked':>8}"
+                  f"{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for stage in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{stage['users']} users: {stage['requests']} requests in {stage['elapsed_s']}s, "
+                f"{stage['rps']} req/s, {stage['errors']} errors, {stage['lock_errors']} lock errors"))
+            self.stdout.write(header)
+            for endpoint, row in stage['endpoints'].items():
+                self.stdout.write(
+                    f"{endpoint:<34}{row['requests']:>9}{row['errors']:>8}{row['lock_errors']:>8}"
+                    f"{row['rps']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+            self.stdout.write(
+                f"{'all':<34}{stage['requests']:>9}{stage['errors']:>8}{stage['lock_errors']:>8}"
+                f"{stage['rps']:>9.1f}{stage['p50_ms']:>9.1f}{stage['p95_ms']:>9.1f}{stage['p99_ms']:>9.1f}")
@@ -0,0 +1,29 @@
+# management command that recomputes the bead demand counters from the open custom orders
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.bead_demand import count_beads
+from shop.models import BeadDemand, Order
+
+# counter rows written per INSERT
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ("Rebuilds the bead demand counters from the open custom bracelet orders. "
+            "Run rebuild_leaderboards first so older custom orders are linked to their designs.")
+
+    def handle(self, *args, **options):
+        open_orders = Order.objects.filter(done=False, cancelled=False, custom_design__isnull=False)
+        with transaction.atomic():
+            BeadDemand.objects.all().delete()
+            counters = [
+                BeadDemand(seller_id=seller_id, day=day, shape=shape, color=color,
+                           size=size, letter=letter, count=count)
+                for (seller_id, day, shape, color, size, letter), count
+                in count_beads(open_orders.select_for_update()).items() if count
+            ]
+            BeadDemand.objects.bulk_create(counters, batch_size=BATCH_SIZE)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(counters)} bead demand counter row(s) for {open_orders.count()} open custom order(s)."))
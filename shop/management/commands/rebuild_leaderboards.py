@@ -0,0 +1,84 @@
+# management command that recomputes the daily sales counters from the order history
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+from shop.models import (ArchivedOrder, CustomBraceletDesign, DesignDailySales, Order,
+                         ProductDailySales)
+
+# counter rows written per INSERT
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Links old custom bracelet orders to their designs and rebuilds the product and design sales counters."
+
+    def handle(self, *args, **options):
+        linked = sum(self.link_designs(model) for model in (Order, ArchivedOrder))
+        with transaction.atomic():
+            ProductDailySales.objects.all().delete()
+            DesignDailySales.objects.all().delete()
+            products = self.rebuild(ProductDailySales, {'product_id': 'product_id'})
+            designs = self.rebuild(DesignDailySales, {'design_id': 'custom_design_id', 'seller_id': 'order_seller'})
+        self.stdout.write(self.style.SUCCESS(
+            f"Linked {linked} custom order(s), wrote {products} product and {designs} design counter row(s)."))
+
+    # custom orders placed before orders kept their design are matched by name, like the order pages did
+    def link_designs(self, model):
+        orders = model.objects.filter(
+            custom_design__isnull=True, product__name__startswith='Custom: '
+        ).values_list('id', 'customer_id', 'product__name')
+        designs = {}
+        for design_id, customer_id, name in CustomBraceletDesign.objects.order_by('-id').values_list(
+                'id', 'customer_id', 'name'):
+            # the oldest design wins when a customer reused a name
+            designs[(customer_id, name)] = design_id
+
+        by_design = defaultdict(list)
+        for order_id, customer_id, product_name in orders.iterator():
+            design_id = designs.get((customer_id, product_name.replace('Custom: ', '', 1)))
+            if design_id:
+                by_design[design_id].append(order_id)
+        with transaction.atomic():
+            for design_id, order_ids in by_design.items():
+                model.objects.filter(id__in=order_ids).update(custom_design_id=design_id)
+        return sum(len(order_ids) for order_ids in by_design.values())
+
+    # sums live and archived orders per counter key and day, then inserts the counter rows
+    # fields maps counter columns to the order values they are grouped by
+    def rebuild(self, counter_model, fields):
+        open_orders = Q(cancelled=False)
+        order_fields = list(fields.values())
+        totals = defaultdict(lambda: {'orders': 0, 'units': 0, 'revenue': Decimal('0.00')})
+        for model in (Order, ArchivedOrder):
+            rows = (
+                model.objects.filter(**{f'{order_fields[0]}__isnull': False})
+                # orders from before the seller column take the seller of their product
+                .annotate(day=TruncDate('created_at'), order_seller=Coalesce('seller', 'product__created_by'))
+                .values(*order_fields, 'day')
+                .annotate(
+                    orders=Count('id', filter=open_orders),
+                    units=Sum('quantity', filter=open_orders),
+                    revenue=Sum('line_total', filter=open_orders & Q(done=True)),
+                )
+                .order_by()
+            )
+            for row in rows.iterator():
+                total = totals[(tuple(row[field] for field in order_fields), row['day'])]
+                total['orders'] += row['orders']
+                total['units'] += row['units'] or 0
+                total['revenue'] += row['revenue'] or Decimal('0.00')
+
+        # orders whose product has no seller either are left out, a NULL column would let the
+        # unique constraint accept a second row for the same key and day
+        counters = [
+            counter_model(**dict(zip(fields, key)), day=day, **total)
+            for (key, day), total in totals.items() if None not in key and any(total.values())
+        ]
+        counter_model.objects.bulk_create(counters, batch_size=BATCH_SIZE)
+        return len(counters)
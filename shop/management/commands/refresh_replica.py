@@ -0,0 +1,52 @@
+# management command that refreshes the sqlite read replica from the primary
+
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from shop.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = "Copies the primary sqlite database to the read replica using the backup API."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep refreshing every INTERVAL seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No replica database is configured.")
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replica = settings.DATABASES[alias]
+        sqlite = 'django.db.backends.sqlite3'
+        if primary['ENGINE'] != sqlite or replica['ENGINE'] != sqlite:
+            raise CommandError("Only sqlite replicas can be refreshed by this command.")
+
+        while True:
+            started = time.monotonic()
+            self.refresh(str(primary['NAME']), str(replica['NAME']))
+            self.stdout.write(self.style.SUCCESS(
+                f"Replica refreshed in {time.monotonic() - started:.2f}s."))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    # copies into a temporary file and swaps it in, so readers never see a partial copy
+    def refresh(self, primary_path, replica_path):
+        tmp_path = f"{replica_path}.tmp"
+        source = sqlite3.connect(primary_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            # copy in pages so writers on the primary are only blocked briefly
+            source.backup(target, pages=1024)
+        finally:
+            target.close()
+            source.close()
+        os.replace(tmp_path, replica_path)
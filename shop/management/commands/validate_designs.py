@@ -0,0 +1,85 @@
+# management command that validates custom bracelet design files in bulk and times the validator
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.beads import (BEAD_COLORS, BEAD_SHAPES, BEAD_SIZES, MAX_BEADS, clean_beads,
+                        validate_designs)
+from shop.models import CustomBraceletDesign
+
+
+class Command(BaseCommand):
+    help = ("Validates designs from a json (list) or jsonl file of {name, beads} objects, or the stored "
+            "designs with --stored, and reports the validation cost per design with --benchmark.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="Design file to validate.")
+        parser.add_argument('--stored', action='store_true', help="Validate the designs in the database.")
+        parser.add_argument('--benchmark', type=int, metavar='ROUNDS', default=0,
+                            help="Validate the designs ROUNDS times and report the time per design.")
+
+    def handle(self, *args, **options):
+        if options['path']:
+            designs = self.read_file(options['path'])
+        elif options['stored']:
+            designs = [{'name': name, 'beads': beads} for name, beads in
+                       CustomBraceletDesign.objects.values_list('name', 'beads').iterator()]
+        elif options['benchmark']:
+            designs = [self.sample_design()]
+        else:
+            raise CommandError("Give a design file, --stored or --benchmark.")
+
+        valid, errors = validate_designs(designs)
+        for index, error in errors:
+            self.stdout.write(f"Design {index + 1}: {error}")
+        self.stdout.write(f"{len(valid)} valid, {len(errors)} invalid design(s).")
+
+        if options['benchmark']:
+            self.benchmark(designs, options['benchmark'])
+        if errors:
+            raise CommandError(f"{len(errors)} design(s) failed validation.")
+
+    def read_file(self, path):
+        try:
+            with open(path, encoding='utf-8') as handle:
+                text = handle.read()
+        except OSError as error:
+            raise CommandError(f"Cannot read {path}: {error}")
+        try:
+            data = json.loads(text)
+        except ValueError:
+            # one design per line
+            try:
+                data = [json.loads(line) for line in text.splitlines() if line.strip()]
+            except ValueError:
+                raise CommandError(f"{path} is neither json nor jsonl.")
+        if not isinstance(data, list):
+            raise CommandError("The file must hold a list of designs.")
+        return data
+
+    # a full-size design using the whole palette, as json text like the designer submits it
+    def sample_design(self):
+        shapes, colors, sizes = sorted(BEAD_SHAPES), sorted(BEAD_COLORS), sorted(BEAD_SIZES)
+        beads = [
+            {'shape': shapes[i % len(shapes)], 'color': colors[i % len(colors)].upper(),
+             'size': sizes[i % len(sizes)], 'letter': chr(ord('A') + i % 26)}
+            for i in range(MAX_BEADS)
+        ]
+        return {'name': 'Benchmark', 'beads': json.dumps(beads)}
+
+    def benchmark(self, designs, rounds):
+        payloads = [design.get('beads') if isinstance(design, dict) else None for design in designs]
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for payload in payloads:
+                try:
+                    clean_beads(payload)
+                except ValueError:
+                    pass
+        elapsed = time.perf_counter() - started
+        per_design = elapsed / (rounds * len(payloads)) * 1_000_000 if payloads else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Validated {rounds * len(payloads)} design(s) in {elapsed:.3f}s, "
+            f"{per_design:.1f} µs per design."))
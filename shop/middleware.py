@@ -0,0 +1,160 @@
+# middleware for the shop application
+
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import profiling
+from .roles import seller_profile_id_for
+from .routers import _use_replica, replica_lag
+
+# structured log of slow requests
+perf_logger = logging.getLogger('shop.perf')
+
+# session key holding the time of the session's last write
+LAST_WRITE_KEY = '_replica_last_write'
+
+# request methods that do not write anything
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+# sends reads from replica-enabled views to the replica, except right after a write
+# works under both WSGI and ASGI, process_view is run in a worker thread by django under ASGI
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        # remember writes so this session can read its own writes
+        if request.method not in SAFE_METHODS and hasattr(request, 'session'):
+            request.session[LAST_WRITE_KEY] = time.time()
+        return response
+
+    async def __acall__(self, request):
+        token = _use_replica.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        if request.method not in SAFE_METHODS and hasattr(request, 'session'):
+            await request.session.aset(LAST_WRITE_KEY, time.time())
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(view_func, 'reads_from_replica', False):
+            return None
+        if request.method not in SAFE_METHODS:
+            return None
+        lag = replica_lag()
+        if lag is None or lag > getattr(settings, 'REPLICA_MAX_LAG', 300):
+            return None
+        # stay on the primary until the replica has caught up with this session's last write
+        last_write = request.session.get(LAST_WRITE_KEY, 0) if hasattr(request, 'session') else 0
+        sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 15)
+        if time.time() - lag < last_write + sticky:
+            return None
+        _use_replica.set(True)
+        return None
+
+
+# resolves the user's role once per request from the cache
+class RoleMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.resolve_role(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # loading the user and role may hit the session store and database
+        await sync_to_async(self.resolve_role)(request)
+        return await self.get_response(request)
+
+    def resolve_role(self, request):
+        request.seller_profile_id = seller_profile_id_for(request.user)
+        request.is_seller = request.seller_profile_id is not None
+
+
+# opt-in profiler that reports sql, template and view time per request
+# sync only, since query wrappers are installed per thread, so turning it on under ASGI
+# runs the request in a worker thread
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'SHOP_PROFILING', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile, token = profiling.start_profile()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile.record_sql))
+                response = self.get_response(request)
+        finally:
+            profiling.stop_profile(token)
+        if profile.view_started is not None:
+            profile.view_time = time.perf_counter() - profile.view_started
+        total = profile.total_time()
+
+        match = request.resolver_match
+        url_name = (match.url_name if match else None) or 'unresolved'
+        profiling.record_timing(url_name, total)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.sql_time * 1000:.1f};desc="{len(profile.queries)} queries"',
+            f'tpl;dur={profile.template_time * 1000:.1f}',
+            f'view;dur={profile.view_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        if total * 1000 >= getattr(settings, 'SLOW_REQUEST_MS', 500):
+            perf_logger.warning(json.dumps({
+                'event': 'slow_request',
+                'url_name': url_name,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'view_ms': round(profile.view_time * 1000, 1),
+                'template_ms': round(profile.template_time * 1000, 1),
+                'sql_ms': round(profile.sql_time * 1000, 1),
+                'sql_count': len(profile.queries),
+                'queries': [
+                    {'sql': sql, 'ms': round(duration * 1000, 2)}
+                    for sql, duration in profile.queries
+                ],
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = profiling.current_profile()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+        return None
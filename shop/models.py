@@ -2,6 +2,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .beads import COLOR_NAMES, SHAPE_NAMES, SIZE_NAMES
+
 # model for the seller's profile
 class SellerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -18,6 +20,14 @@ class Product(models.Model):
     created_by = models.ForeignKey(SellerProfile, on_delete=models.CASCADE)
     stock = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    # bumped on every save, used as the version of cached product cards
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the seller's product lists, newest first
+            models.Index(fields=['created_by', 'created_at'], name='product_seller_created_idx'),
+        ]
 
     # string representation of the product
     def __str__(self):
@@ -33,6 +43,13 @@ class Order(models.Model):
         ('delivering', 'Bracelet is Being Delivered'),
         ('delivered', 'Bracelet Delivered'),
     ]
+    # allowed status changes, orders move forward through STATUS_CHOICES one step at a time
+    STATUS_TRANSITIONS = {
+        'waiting': 'pending',
+        'pending': 'created',
+        'created': 'delivering',
+        'delivering': 'delivered',
+    }
     # choices for payment type
     PAYMENT_CHOICES = [
         ('gcash', 'GCash'),
@@ -41,7 +58,14 @@ class Order(models.Model):
 
     customer = models.ForeignKey(User, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # seller of the product, copied on save so seller queries do not join through the product
+    # its own index is left out, the per-seller indexes below start with it
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, null=True, blank=True,
+                               related_name='orders', db_index=False)
     quantity = models.PositiveIntegerField()
+    # price snapshot taken when the order is placed, so revenue does not change with later price edits
+    unit_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     payment_type = models.CharField(max_length=20, choices=PAYMENT_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -49,6 +73,33 @@ class Order(models.Model):
     done = models.BooleanField(default=False)
     cancelled = models.BooleanField(default=False)
     cancel_reason = models.TextField(blank=True, null=True)
+    # design a custom bracelet order was placed for, empty for catalog orders
+    custom_design = models.ForeignKey(
+        'CustomBraceletDesign', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
+
+    class Meta:
+        indexes = [
+            # lets the unpaid order sweeper find expired 'waiting' orders without a table scan
+            models.Index(fields=['status', 'cancelled', 'created_at'], name='order_status_created_idx'),
+            # a seller's order list and dashboard series, by order date
+            models.Index(fields=['seller', 'created_at'], name='order_seller_created_idx'),
+            # a seller's order list filtered by status
+            models.Index(fields=['seller', 'status', 'created_at'], name='order_seller_status_idx'),
+            # a seller's order totals and earnings, every dashboard aggregate filters on the seller
+            # first, and the state columns and line_total are read from the index alone
+            models.Index(fields=['seller', 'done', 'cancelled', 'created_at', 'line_total'],
+                         name='order_seller_revenue_idx'),
+        ]
+
+    # takes the price snapshot and the seller when a new order is saved
+    def save(self, *args, **kwargs):
+        if self.seller_id is None and self.product_id is not None:
+            self.seller_id = self.product.created_by_id
+        if self._state.adding and self.unit_price is None:
+            self.unit_price = self.product.price
+        if self.unit_price is not None:
+            self.line_total = self.unit_price * self.quantity
+        super().save(*args, **kwargs)
 
     # string representation of the order
     def __str__(self):
@@ -71,6 +122,8 @@ class CustomBraceletDesign(models.Model):
     name = models.CharField(max_length=100)
     beads = models.JSONField()  # list of dicts: [{shape, color, size}, ...]
     created_at = models.DateTimeField(auto_now_add=True)
+    # bumped on every save, used as the version of cached design cards
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bracelet_designs')
 
     # string representation of the custom design
@@ -79,50 +132,162 @@ class CustomBraceletDesign(models.Model):
 
     # function to get a text representation of the bead design
     def text_form(self):
-        # mapping for bead shapes
-        bead_names = {
-            'circle': 'Circle',
-            'square': 'Square',
-            'triangle': 'Triangle',
-            'star': 'Star',
-            'heart': 'Heart',
-            'hexagon': 'Hexagon',
-            'diamond': 'Diamond',
-        }
-        # mapping for bead colors
-        color_names = {
-            '#ff0000': 'Red',
-            '#0000ff': 'Blue',
-            '#00ff00': 'Green',
-            '#ffff00': 'Yellow',
-            '#ff00ff': 'Magenta',
-            '#00ffff': 'Cyan',
-            '#ffffff': 'White',
-            '#000000': 'Black',
-            '#ffa500': 'Orange',
-            '#964b00': 'Brown',
-            '#808080': 'Gray',
-            '#ffc0cb': 'Pink',
-            '#8b00ff': 'Violet',
-            '#ffd700': 'Gold',
-            '#228b22': 'Forest Green',
-            '#b22222': 'Firebrick',
-        }
-        # mapping for bead sizes
-        size_names = {
-            'small': 'Small',
-            'medium': 'Medium',
-            'large': 'Large',
-        }
         parts = []
         # loop to build the text description
         for idx, b in enumerate(self.beads, 1):
-            color = color_names.get(b.get('color', '').lower(), b.get('color', 'Unknown'))
-            size = size_names.get(b.get('size'), b.get('size', 'Unknown'))
-            shape = bead_names.get(b.get('shape'), b.get('shape', 'Unknown'))
+            color = COLOR_NAMES.get(b.get('color', '').lower(), b.get('color', 'Unknown'))
+            size = SIZE_NAMES.get(b.get('size'), b.get('size', 'Unknown'))
+            shape = SHAPE_NAMES.get(b.get('shape'), b.get('shape', 'Unknown'))
             letter = b.get('letter', '')
             if letter:
                 parts.append(f"{idx}. {color} {size} {shape} '{letter}'")
             else:
                 parts.append(f"{idx}. {color} {size} {shape}")
-        return parts
\ No newline at end of file
+        return parts
+
+# finished and cancelled orders moved out of the Order table by `manage.py archive_orders`
+class ArchivedOrder(models.Model):
+    # keeps the id the order had in the Order table
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='archived_orders')
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, null=True, blank=True,
+                               related_name='archived_orders', db_index=False)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    payment_type = models.CharField(max_length=20, choices=Order.PAYMENT_CHOICES)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    delivered_at = models.DateTimeField(blank=True, null=True)
+    done = models.BooleanField(default=False)
+    cancelled = models.BooleanField(default=False)
+    cancel_reason = models.TextField(blank=True, null=True)
+    custom_design = models.ForeignKey(
+        CustomBraceletDesign, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # lets templates tell archived orders apart from live ones
+    is_archived = True
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'created_at'], name='archived_customer_created_idx'),
+            models.Index(fields=['seller', 'created_at'], name='archived_seller_created_idx'),
+        ]
+
+    # string representation of the archived order
+    def __str__(self):
+        return f"Archived order #{self.id} - {self.product.name} ({self.customer.username})"
+
+
+# messages of archived orders
+class ArchivedOrderMessage(models.Model):
+    # keeps the id the message had in the OrderMessage table
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    text = models.TextField(blank=True)
+    image = models.ImageField(upload_to='order_messages/', blank=True, null=True)
+    timestamp = models.DateTimeField()
+
+    # string representation of the archived order message
+    def __str__(self):
+        return f"Message for archived order #{self.order_id} by {self.sender.username}"
+
+
+# per-day totals of a seller's archived orders, so dashboard totals stay correct after archiving
+class ArchivedOrderRollup(models.Model):
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name='archived_rollups')
+    day = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='archived_rollup_seller_day'),
+        ]
+
+    # string representation of the rollup
+    def __str__(self):
+        return f"{self.seller} {self.day}: {self.orders} archived orders"
+
+
+
+# per-day sales counters of a product, kept up to date as orders are placed, cancelled and completed
+# orders and units count orders that are not cancelled, revenue counts completed orders
+class ProductDailySales(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    # day the orders were placed
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='product_sales_product_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='product_sales_day_idx'),
+        ]
+
+    # string representation of the counter
+    def __str__(self):
+        return f"{self.product} {self.day}: {self.units} sold"
+
+
+# per-day sales counters of a custom bracelet design per seller, same rules as ProductDailySales
+class DesignDailySales(models.Model):
+    design = models.ForeignKey(CustomBraceletDesign, on_delete=models.CASCADE, related_name='daily_sales')
+    # seller the design was ordered from, the gallery adds up all sellers
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, null=True, blank=True,
+                               related_name='design_sales', db_index=False)
+    # day the orders were placed
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['design', 'seller', 'day'], name='design_sales_design_seller_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='design_sales_day_idx'),
+            models.Index(fields=['seller', 'day'], name='design_sales_seller_day_idx'),
+        ]
+
+    # string representation of the counter
+    def __str__(self):
+        return f"{self.design} {self.day}: {self.orders} orders"
+
+
+# beads needed by open custom orders, per seller, order day and bead type
+# kept up to date as custom orders are placed, completed and cancelled
+class BeadDemand(models.Model):
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name='bead_demand')
+    # day the orders were placed
+    day = models.DateField()
+    shape = models.CharField(max_length=20)
+    color = models.CharField(max_length=7)
+    size = models.CharField(max_length=10)
+    # empty for beads without a letter
+    letter = models.CharField(max_length=1, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # also the index for "how many of this bead between these days"
+            models.UniqueConstraint(fields=['seller', 'shape', 'color', 'size', 'day', 'letter'],
+                                    name='bead_demand_key'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'day'], name='bead_demand_seller_day_idx'),
+        ]
+
+    # string representation of the bead demand
+    def __str__(self):
+        return f"{self.count} x {self.color} {self.size} {self.shape} {self.letter}".rstrip()
@@ -0,0 +1,114 @@
+# per-request profiling: sql and template timings plus rolling latency histograms
+
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+# profile of the request being handled, None when profiling is off
+_current = contextvars.ContextVar('request_profile', default=None)
+
+# rolling window of request durations per url name
+_timings = defaultdict(lambda: deque(maxlen=getattr(settings, 'PROFILING_WINDOW', 1000)))
+_timings_lock = threading.Lock()
+
+
+# timings collected while handling one request
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_time = 0.0
+        self.template_time = 0.0
+        self.sql_time = 0.0
+        self.queries = []
+
+    # execute_wrapper hook that times every sql statement
+    def record_sql(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.sql_time += duration
+            self.queries.append((sql, duration))
+
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+
+# starts profiling the current request
+def start_profile():
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+# returns the profile of the current request, if any
+def current_profile():
+    return _current.get()
+
+
+# stops profiling the current request
+def stop_profile(token):
+    _current.reset(token)
+
+
+# adds a finished request to the histogram of its url name
+def record_timing(url_name, seconds):
+    with _timings_lock:
+        _timings[url_name].append(seconds * 1000)
+
+
+# returns the value at the given percentile of a sorted list
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+# returns p50/p95/p99 latencies per url name, slowest p95 first
+def timing_summary():
+    with _timings_lock:
+        snapshot = {name: sorted(values) for name, values in _timings.items()}
+    rows = []
+    for name, values in snapshot.items():
+        rows.append({
+            'url_name': name,
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': values[-1] if values else 0.0,
+        })
+    rows.sort(key=lambda row: row['p95'], reverse=True)
+    return rows
+
+
+# template wrapper that adds its render time to the current profile
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = current_profile()
+        if profile is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - start
+
+
+# django template backend whose templates report their render time
+class ProfiledDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfiledTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,43 @@
+# cached lookups for user roles, so views do not query the seller profile on every request
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import SellerProfile
+
+# cache keys for role data
+ROLE_KEY = 'shop:role:{}'
+SELLERS_KEY = 'shop:sellers'
+
+
+# how long role data may be cached, bounds staleness when running several processes
+def role_cache_timeout():
+    return getattr(settings, 'ROLE_CACHE_TIMEOUT', 300)
+
+
+# returns the seller profile id of a user, or None for customers and anonymous users
+def seller_profile_id_for(user):
+    if not user.is_authenticated:
+        return None
+    key = ROLE_KEY.format(user.pk)
+    profile_id = cache.get(key)
+    if profile_id is None:
+        # 0 is cached for customers so they are not looked up again
+        profile_id = SellerProfile.objects.filter(
+            user_id=user.pk).values_list('id', flat=True).first() or 0
+        cache.set(key, profile_id, role_cache_timeout())
+    return profile_id or None
+
+
+# (seller profile id, username) of every seller, oldest first, for customers choosing a maker
+def seller_list():
+    sellers = cache.get(SELLERS_KEY)
+    if sellers is None:
+        sellers = list(SellerProfile.objects.order_by('id').values_list('id', 'user__username'))
+        cache.set(SELLERS_KEY, sellers, role_cache_timeout())
+    return sellers
+
+
+# clears cached role data after a seller profile or seller name changes
+def invalidate_roles(user_id):
+    cache.delete_many([ROLE_KEY.format(user_id), SELLERS_KEY])
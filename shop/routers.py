@@ -0,0 +1,61 @@
+# database router that sends read-heavy pages to a read replica
+
+import contextvars
+import os
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# set by the replica middleware while a replica-enabled view is running
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+# marks a view as safe to serve from the read replica
+def reads_from_replica(view_func):
+    view_func.reads_from_replica = True
+    return view_func
+
+
+# returns the replica alias if one is configured
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+# returns how many seconds the replica is behind the primary
+def replica_lag():
+    alias = replica_alias()
+    if alias is None:
+        return None
+    db = settings.DATABASES[alias]
+    # sqlite replicas are refreshed by copying the primary, so the file age is the lag
+    if db['ENGINE'] == 'django.db.backends.sqlite3':
+        try:
+            return max(0.0, time.time() - os.path.getmtime(db['NAME']))
+        except OSError:
+            return None
+    # other replicas are kept current by the database server itself
+    return 0.0
+
+
+# routes reads of shop data to the replica while a replica-enabled view runs
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # auth, session and seller role data always come from the primary
+        if model._meta.app_label != 'shop' or model._meta.model_name == 'sellerprofile':
+            return None
+        if not _use_replica.get():
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica is a copy of the primary, so objects from both can be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica receives its schema from the primary copy
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,49 @@
+# per-seller cache namespaces, so one seller's new orders only expire that seller's cached data
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# version of a seller's namespace, changing it expires everything cached under the old version
+SELLER_VERSION_KEY = 'shop:seller:{}:version'
+SELLER_KEY = 'shop:seller:{}:{}:{}'
+
+
+# how long seller data may be cached, bounds staleness for changes that do not expire it
+def seller_cache_timeout():
+    return getattr(settings, 'SELLER_CACHE_TIMEOUT', 60)
+
+
+# cache key of a value in the seller's current namespace
+def seller_key(seller_profile_id, name):
+    # a lost version restarts from the clock, never from a version that may still have entries
+    version = cache.get_or_set(SELLER_VERSION_KEY.format(seller_profile_id), time.time_ns, None)
+    return SELLER_KEY.format(seller_profile_id, version, name)
+
+
+# returns func() cached under name in the seller's namespace
+def cached_for_seller(seller_profile_id, name, func):
+    key = seller_key(seller_profile_id, name)
+    value = cache.get(key)
+    if value is None:
+        value = func()
+        cache.set(key, value, seller_cache_timeout())
+    return value
+
+
+# expires the cached data of the given sellers once the current transaction commits
+def expire_seller_cache(seller_profile_ids):
+    seller_profile_ids = {seller_id for seller_id in seller_profile_ids if seller_id}
+
+    def expire():
+        for seller_profile_id in seller_profile_ids:
+            key = SELLER_VERSION_KEY.format(seller_profile_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), None)
+
+    if seller_profile_ids:
+        transaction.on_commit(expire)
@@ -0,0 +1,31 @@
+# signal handlers that keep cached data in sync with the database
+
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import USER_KEY
+from .models import SellerProfile
+from .roles import invalidate_roles
+
+
+# forgets a user's cached role when their seller profile is created or removed
+@receiver([post_save, post_delete], sender=SellerProfile)
+def seller_profile_changed(sender, instance, **kwargs):
+    invalidate_roles(instance.user_id)
+
+
+# forgets a cached user after their account changes, password changes and deactivations
+# included since both save the user
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    cache.delete(USER_KEY.format(instance.pk))
+
+
+# forgets a cached user when they log out
+@receiver(user_logged_out)
+def user_logged_out_of_site(sender, request, user, **kwargs):
+    if user is not None:
+        cache.delete(USER_KEY.format(user.pk))
@@ -1,7 +1,7 @@
 # urls for the shop application
 
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # home page
@@ -20,10 +20,16 @@ urlpatterns = [
 
     # seller dashboard and management
     path('seller/dashboard/', views.seller_dashboard, name='seller_dashboard'),
+    path('seller/dashboard/data/', views.seller_dashboard_data, name='seller_dashboard_data'),
     path('seller/manage-orders/', views.manage_orders_list, name='manage_orders_list'),
+    path('seller/export/orders/', views.export_orders, name='export_orders'),
+    path('seller/export/designs/', views.export_designs, name='export_designs'),
+    path('seller/bead-demand/', views.bead_demand_report, name='bead_demand'),
     path('seller/manage-products/', views.manage_products_list, name='manage_products_list'),
+    path('seller/manage-products/bulk/', views.bulk_edit_products, name='bulk_edit_products'),
     path('seller/order/<int:order_id>/manage/', views.manage_order, name='manage_order'),
     path('seller/update/', views.update_seller_view, name='update_seller'),
+    path('seller/perf/', views.seller_perf, name='seller_perf'),
 
     # custom bracelet design urls
     path('customize/', views.customize_bracelet, name='customize_bracelet'),
@@ -31,4 +37,13 @@ urlpatterns = [
     path('customize/<int:design_id>/', views.bracelet_design_detail, name='bracelet_design_detail'),
     path('customize/<int:design_id>/order/', views.order_custom_bracelet, name='order_custom_bracelet'),
     path('designs/', views.public_custom_designs, name='public_custom_designs'),
+
+    # read-only json api, version 1
+    path('api/v1/products/', api.products, name='api_products'),
+    path('api/v1/products/<int:product_id>/', api.product_detail, name='api_product_detail'),
+    path('api/v1/designs/', api.designs, name='api_designs'),
+    path('api/v1/designs/<int:design_id>/', api.design_detail, name='api_design_detail'),
+    path('api/v1/orders/', api.orders, name='api_orders'),
+    path('api/v1/orders/<int:order_id>/', api.order_detail, name='api_order_detail'),
+    path('api/v1/orders/<int:order_id>/messages/', api.order_messages, name='api_order_messages'),
 ]
\ No newline at end of file
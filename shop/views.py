@@ -1,25 +1,47 @@
 # standard library imports
 import datetime
-import json
 from decimal import Decimal
+from functools import partial
 
 # django imports
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
 from django.core.paginator import Paginator
-from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db import transaction
+from django.db.models import F
 from django.forms import ModelForm
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.utils import timezone
+from django.views.decorators.vary import vary_on_cookie
 from django import forms
 
 
 # local application imports
-from .models import (CustomBraceletDesign, Order, OrderMessage, Product,
-                     SellerProfile)
+from .models import (ArchivedOrder, CustomBraceletDesign, Order, OrderMessage,
+                     Product, SellerProfile)
+from . import bead_demand, dashboard, http_cache, profiling, roles
+from .archive import paginate_with_archived
+from .bead_demand import add_open_orders, remove_open_orders
+from .beads import COLOR_NAMES, SHAPE_NAMES, SIZE_NAMES, clean_beads
+from .bulk import (apply_product_changes, cancel_orders, complete_orders,
+                   read_product_csv, restore_stock, transition_orders)
+from .exports import astream_export, stream_export
+from .filters import filter_orders, parse_day
+from .fragments import arender_fragments, render_fragments
+from .leaderboards import (order_by_popularity, record_cancelled,
+                           record_completed, record_placed)
+from .roles import seller_profile_id_for
+from .routers import reads_from_replica
+
+# longest custom bracelet design name the model accepts
+DESIGN_NAME_LENGTH = CustomBraceletDesign._meta.get_field('name').max_length
 
 
 # handles the home page
@@ -48,57 +70,72 @@ class OrderMessageForm(forms.ModelForm):
         fields = ['text', 'image']
 
 
+# renders a template from an async view, context processors read the session and messages
+arender = sync_to_async(render)
+
+
 # displays the product catalog
-def catalog(request):
-    products = Product.objects.all()
-    return render(request, 'shop/catalog.html', {'products': products})
+@reads_from_replica
+@vary_on_cookie
+@http_cache.acondition(etag_func=http_cache.catalog_etag,
+                       last_modified_func=http_cache.catalog_last_modified)
+async def catalog(request):
+    # anonymous visitors all see the same page, so the whole response is shared
+    # (the validators already loaded the messages and catalog state, so these checks do not query)
+    page_key = None
+    if not request.user.is_authenticated and not http_cache.has_pending_messages(request):
+        page_key = f"page:catalog:anon:{http_cache.catalog_etag(request)}"
+        content = await cache.aget(page_key)
+        if content is not None:
+            return HttpResponse(content)
+
+    # custom bracelet products are per-order and not listed in the catalog
+    products = http_cache.catalog_queryset()
+    can_order = request.user.is_authenticated and not request.is_seller
+    product_cards = await arender_fragments(
+        'shop/partials/product_card.html', products, 'product',
+        variant='order' if can_order else 'view',
+        extra_context={'can_order': can_order})
+    response = await arender(request, 'shop/catalog.html', {'product_cards': product_cards})
+    if page_key:
+        await cache.aset(page_key, response.content, getattr(settings, 'PAGE_CACHE_TIMEOUT', 600))
+    return response
+
+
+# paginates a queryset with the async ORM, the page's objects are loaded into a list
+async def _apaginate(qs, page_number, per_page):
+    paginator = Paginator(qs, per_page)
+    # count is a cached property, filling it keeps get_page from running a blocking query
+    paginator.count = await qs.acount()
+    page_obj = paginator.get_page(page_number)
+    page_obj.object_list = [obj async for obj in page_obj.object_list]
+    return page_obj
 
 
 # handles the customer's list of orders
-def order_list(request):
+async def order_list(request):
     # authentication check
-    if not request.user.is_authenticated or hasattr(request.user, 'sellerprofile'):
+    if not request.user.is_authenticated or request.is_seller:
         return redirect('login')
 
     # handles sending a message on an order
     if request.method == 'POST':
-        order_id = request.POST.get('order_id')
-        try:
-            order = Order.objects.get(id=order_id, customer=request.user)
-        except Order.DoesNotExist:
-            messages.error(request, "Order not found.")
-            qs = request.META.get('QUERY_STRING', '')
-            return redirect(request.path + (f"?{qs}" if qs else ""))
-        msg_form = OrderMessageForm(request.POST, request.FILES)
-        if msg_form.is_valid():
-            msg = msg_form.save(commit=False)
-            msg.order = order
-            msg.sender = request.user
-            msg.save()
-            messages.success(request, "Message sent.")
-        else:
-            messages.error(request, "Failed to send message.")
-        qs = request.META.get('QUERY_STRING', '')
-        return redirect(request.path + (f"?{qs}" if qs else ""))
+        return await sync_to_async(_send_order_message)(request)
 
     # handles filtering, searching, and sorting for the order list
-    qs = Order.objects.filter(customer=request.user)
-
-    status = request.GET.get('status', '')
-    cancelled = request.GET.get('cancelled', '')  # 'yes' / 'no' / ''
     sort_by = request.GET.get('sort_by', 'created_at')
     sort_dir = request.GET.get('sort_dir', 'desc')
     search = request.GET.get('search', '').strip()
+    include_archived = request.GET.get('archived') == 'yes'
 
-    if status:
-        qs = qs.filter(status=status)
-    if cancelled == 'yes':
-        qs = qs.filter(cancelled=True)
-    elif cancelled == 'no':
-        qs = qs.filter(cancelled=False)
+    # the same filters apply to live and archived orders
+    def apply_filters(qs):
+        qs, filters = filter_orders(qs.filter(customer=request.user), request.GET)
+        if search:
+            qs = qs.filter(product__name__icontains=search)
+        return qs, filters
 
-    if search:
-        qs = qs.filter(product__name__icontains=search)
+    qs, filters = apply_filters(Order.objects.select_related('product'))
 
     allowed_order_fields = {'created_at', 'delivered_at'}
     if sort_by not in allowed_order_fields:
@@ -107,27 +144,54 @@ def order_list(request):
     qs = qs.order_by(order_field)
 
     # handles pagination
-    paginator = Paginator(qs, 10)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if include_archived:
+        archived_qs, _ = apply_filters(ArchivedOrder.objects.all())
+        page_obj = await sync_to_async(paginate_with_archived)(
+            qs, archived_qs, sort_by, sort_dir, page_number)
+    else:
+        page_obj = await _apaginate(qs, page_number, 10)
 
     # prepare empty message forms for visible orders
     msg_forms = {order.id: OrderMessageForm() for order in page_obj.object_list}
 
-    return render(request, 'shop/order_list.html', {
+    return await arender(request, 'shop/order_list.html', {
         'page_obj': page_obj,
         'msg_forms': msg_forms,
         'filters': {
-            'status': status,
-            'cancelled': cancelled,
+            'status': filters['status'],
+            'cancelled': filters['cancelled'],
             'sort_by': sort_by,
             'sort_dir': sort_dir,
             'search': search,
+            'archived': 'yes' if include_archived else '',
         },
         'status_choices': Order.STATUS_CHOICES,
     })
 
 
+# sends a message on one of the customer's orders from the order list
+def _send_order_message(request):
+    order_id = request.POST.get('order_id')
+    try:
+        order = Order.objects.get(id=order_id, customer=request.user)
+    except Order.DoesNotExist:
+        messages.error(request, "Order not found.")
+        qs = request.META.get('QUERY_STRING', '')
+        return redirect(request.path + (f"?{qs}" if qs else ""))
+    msg_form = OrderMessageForm(request.POST, request.FILES)
+    if msg_form.is_valid():
+        msg = msg_form.save(commit=False)
+        msg.order = order
+        msg.sender = request.user
+        msg.save()
+        messages.success(request, "Message sent.")
+    else:
+        messages.error(request, "Failed to send message.")
+    qs = request.META.get('QUERY_STRING', '')
+    return redirect(request.path + (f"?{qs}" if qs else ""))
+
+
 # page to choose between login and register
 def login_register(request):
     return render(request, 'shop/login_register.html')
@@ -137,7 +201,7 @@ def login_register(request):
 def login_view(request):
     if request.user.is_authenticated:
         # Redirect seller to dashboard, customer to home
-        if hasattr(request.user, 'sellerprofile'):
+        if request.is_seller:
             return redirect('seller_dashboard')
         return redirect('home')
     if request.method == 'POST':
@@ -145,7 +209,7 @@ def login_view(request):
         if form.is_valid():
             user = form.get_user()
             # If this user has a SellerProfile, treat them as seller
-            if hasattr(user, 'sellerprofile'):
+            if seller_profile_id_for(user):
                 login(request, user)
                 return redirect('seller_dashboard')
             # Otherwise treat as regular customer
@@ -182,21 +246,17 @@ class SellerUpdateForm(forms.ModelForm):
 def register_view(request):
     if request.user.is_authenticated:
         return redirect('home')
-    seller_exists = SellerProfile.objects.exists()
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
         is_seller = request.POST.get('is_seller') == 'on'
         if form.is_valid():
-            if is_seller and not seller_exists:
-                user = form.save()
-                user.is_superuser = True
-                user.is_staff = True
-                user.save()
-                SellerProfile.objects.create(user=user)
+            if is_seller:
+                # sellers only get their own shop, admin access comes from `manage.py createsuperuser`
+                with transaction.atomic():
+                    user = form.save()
+                    SellerProfile.objects.create(user=user)
                 login(request, user)
                 return redirect('seller_dashboard')
-            elif is_seller and seller_exists:
-                messages.error(request, "Seller account already exists.")
             else:
                 user = form.save()
                 login(request, user)
@@ -206,7 +266,7 @@ def register_view(request):
                 request, "Registration failed. Please correct the errors below.")
     else:
         form = UserCreationForm()
-    return render(request, 'shop/register.html', {'form': form, 'seller_exists': seller_exists})
+    return render(request, 'shop/register.html', {'form': form})
 
 
 # handles user logout
@@ -216,16 +276,17 @@ def logout_view(request):
 
 
 # handles the seller dashboard page
+@reads_from_replica
 def seller_dashboard(request):
     # authentication check
-    if not request.user.is_authenticated or not hasattr(request.user, 'sellerprofile'):
+    if not request.is_seller:
         return redirect('login')
 
-    seller_profile = request.user.sellerprofile
+    seller_profile_id = request.seller_profile_id
     products_qs = Product.objects.filter(
-        created_by=seller_profile).order_by('-created_at')
+        created_by_id=seller_profile_id).order_by('-created_at')
     orders_qs = Order.objects.filter(
-        product__created_by=seller_profile).order_by('-created_at')
+        seller_id=seller_profile_id).order_by('-created_at')
 
     # handles product creation and stock updates
     if request.method == 'POST':
@@ -234,9 +295,9 @@ def seller_dashboard(request):
             new_stock = request.POST.get('new_stock')
             try:
                 product = Product.objects.get(
-                    id=product_id, created_by=seller_profile)
+                    id=product_id, created_by_id=seller_profile_id)
                 product.stock = int(new_stock)
-                product.save()
+                product.save(update_fields=['stock', 'updated_at'])
                 messages.success(
                     request, f"Stock updated for {product.name}!")
             except Exception:
@@ -246,7 +307,7 @@ def seller_dashboard(request):
             form = ProductForm(request.POST, request.FILES)
             if form.is_valid():
                 product = form.save(commit=False)
-                product.created_by = seller_profile
+                product.created_by_id = seller_profile_id
                 product.save()
                 messages.success(request, "Product added!")
                 return redirect('seller_dashboard')
@@ -254,81 +315,48 @@ def seller_dashboard(request):
         form = ProductForm()
 
     # analytics for the page
-    now = timezone.now()
-    today = now.date()
-    completed_qs = orders_qs.filter(done=True, cancelled=False)
-    cancelled_qs = orders_qs.filter(cancelled=True)
+    today = timezone.localdate()
 
-    # totals
+    # totals, live and archived orders counted in one query
     total_products = products_qs.count()
-    total_orders = orders_qs.count()
-    total_completed = completed_qs.count()
-    total_cancelled = cancelled_qs.count()
-
-    # earnings calculation
-    total_earnings = completed_qs.aggregate(
-        total=Sum(
-            ExpressionWrapper(F('product__price') * F('quantity'),
-                              output_field=DecimalField(max_digits=12, decimal_places=2)))
-    ).get('total') or Decimal('0.00')
-
-    avg_order_value = (
-        total_earnings / total_completed) if total_completed else Decimal('0.00')
-
-    # top products
-    top_products = list(
-        orders_qs.values('product__id', 'product__name')
-        .annotate(total_qty=Sum('quantity'))
-        .order_by('-total_qty')[:3]
-    )
+    totals = dashboard.cached_order_totals(seller_profile_id)
+    total_orders = totals['orders']
+    total_completed = totals['completed']
+    total_cancelled = totals['cancelled']
+    total_earnings = totals['earnings']
+    avg_order_value = totals['avg_order_value']
+
+    # leaderboards, read from the daily sales counters
+    best_products = dashboard.cached_top_products(seller_profile_id, limit=3)
+    popular_designs = dashboard.cached_top_designs(seller_profile_id, days=30, limit=3)
 
     # recent products and orders for display
     products = products_qs[:5]
     orders = orders_qs[:5]
 
-    # helper for date ranges
-    def daterange(start, end):
-        for n in range((end - start).days + 1):
-            yield start + datetime.timedelta(n)
-
-    # data for graphs
-    def get_series_by_period(qs, start, end, by='hour', field=None):
-        series = []
-        if by == 'hour':
-            for hour in range(24):
-                s = datetime.datetime.combine(
-                    start, datetime.time(hour, 0, 0, tzinfo=now.tzinfo))
-                e = s + datetime.timedelta(hours=1)
-                qs_in_period = qs.filter(created_at__gte=s, created_at__lt=e)
-                if field == 'earnings':
-                    total = qs_in_period.aggregate(
-                        total=Sum(ExpressionWrapper(F('product__price') * F('quantity'),
-                                                    output_field=DecimalField(max_digits=12, decimal_places=2)))
-                    )['total'] or Decimal('0.00')
-                    series.append({'label': f"{hour}:00", 'value': float(total)})
-                else:
-                    series.append(
-                        {'label': f"{hour}:00", 'value': qs_in_period.count()})
-        else:  # by day
-            for d in daterange(start, end):
-                qs_in_period = qs.filter(created_at__date=d)
-                if field == 'earnings':
-                    total = qs_in_period.aggregate(
-                        total=Sum(ExpressionWrapper(F('product__price') * F('quantity'),
-                                                    output_field=DecimalField(max_digits=12, decimal_places=2)))
-                    )['total'] or Decimal('0.00')
-                    series.append(
-                        {'label': d.strftime("%b %d"), 'value': float(total)})
-                else:
-                    series.append(
-                        {'label': d.strftime("%b %d"), 'value': qs_in_period.count()})
-        return series
-
-    # time series data
-    first_order_date = orders_qs.order_by(
-        'created_at').first().created_at.date() if orders_qs.exists() else today
-    first_completed_date = completed_qs.order_by(
-        'created_at').first().created_at.date() if completed_qs.exists() else today
+    # data for graphs, every chart is cut from one cached per-day series and one cached
+    # per-hour series of today, archived orders included in the days
+    first_days = dashboard.cached_first_order_days(seller_profile_id)
+    first_order_date = first_days['orders'] or today
+    first_completed_date = first_days['completed'] or today
+    week_start = today - datetime.timedelta(days=6)
+    month_start = today - datetime.timedelta(days=29)
+    days = dashboard.cached_daily_series(seller_profile_id, min(first_order_date, month_start), today)
+    hours = dashboard.cached_hourly_series(seller_profile_id, today)
+
+    def chart_value(point, key):
+        return float(point[key]) if key == 'earnings' else point[key]
+
+    def get_series_by_day(key, start):
+        start = start.isoformat()
+        return [
+            {'label': datetime.date.fromisoformat(point['day']).strftime("%b %d"),
+             'value': chart_value(point, key)}
+            for point in days if point['day'] >= start
+        ]
+
+    def get_series_by_hour(key):
+        return [{'label': f"{point['hour']}:00", 'value': chart_value(point, key)} for point in hours]
 
     context = {
         'form': form,
@@ -340,36 +368,65 @@ def seller_dashboard(request):
         'total_completed': total_completed,
         'total_cancelled': total_cancelled,
         'avg_order_value': avg_order_value,
-        'top_products': top_products,
+        'top_products': best_products,
+        'popular_designs': popular_designs,
 
         # analytics graphs data
-        'orders_placed_today': get_series_by_period(orders_qs, today, today, by='hour'),
-        'orders_placed_7': get_series_by_period(orders_qs, today - datetime.timedelta(days=6), today, by='day'),
-        'orders_placed_30': get_series_by_period(orders_qs, today - datetime.timedelta(days=29), today, by='day'),
-        'orders_placed_all': get_series_by_period(orders_qs, first_order_date, today, by='day'),
-
-        'earnings_today_series': get_series_by_period(completed_qs, today, today, by='hour', field='earnings'),
-        'earnings_7_series': get_series_by_period(completed_qs, today - datetime.timedelta(days=6), today, by='day', field='earnings'),
-        'earnings_30_series': get_series_by_period(completed_qs, today - datetime.timedelta(days=29), today, by='day', field='earnings'),
-        'earnings_all_series': get_series_by_period(completed_qs, first_completed_date, today, by='day', field='earnings'),
-
-        'completed_today_series': get_series_by_period(completed_qs, today, today, by='hour'),
-        'completed_7_series': get_series_by_period(completed_qs, today - datetime.timedelta(days=6), today, by='day'),
-        'completed_30_series': get_series_by_period(completed_qs, today - datetime.timedelta(days=29), today, by='day'),
-        'completed_all_series': get_series_by_period(completed_qs, first_completed_date, today, by='day'),
-
-        'cancelled_today_series': get_series_by_period(cancelled_qs, today, today, by='hour'),
-        'cancelled_7_series': get_series_by_period(cancelled_qs, today - datetime.timedelta(days=6), today, by='day'),
-        'cancelled_30_series': get_series_by_period(cancelled_qs, today - datetime.timedelta(days=29), today, by='day'),
-        'cancelled_all_series': get_series_by_period(cancelled_qs, first_order_date, today, by='day'),
+        'orders_placed_today': get_series_by_hour('orders'),
+        'orders_placed_7': get_series_by_day('orders', week_start),
+        'orders_placed_30': get_series_by_day('orders', month_start),
+        'orders_placed_all': get_series_by_day('orders', first_order_date),
+
+        'earnings_today_series': get_series_by_hour('earnings'),
+        'earnings_7_series': get_series_by_day('earnings', week_start),
+        'earnings_30_series': get_series_by_day('earnings', month_start),
+        'earnings_all_series': get_series_by_day('earnings', first_completed_date),
+
+        'completed_today_series': get_series_by_hour('completed'),
+        'completed_7_series': get_series_by_day('completed', week_start),
+        'completed_30_series': get_series_by_day('completed', month_start),
+        'completed_all_series': get_series_by_day('completed', first_completed_date),
+
+        'cancelled_today_series': get_series_by_hour('cancelled'),
+        'cancelled_7_series': get_series_by_day('cancelled', week_start),
+        'cancelled_30_series': get_series_by_day('cancelled', month_start),
+        'cancelled_all_series': get_series_by_day('cancelled', first_order_date),
     }
 
     return render(request, 'shop/seller_dashboard.html', context)
 
 
+# json data for the seller dashboard over the last ?days= days, the independent
+# aggregates run at the same time in separate threads
+@reads_from_replica
+async def seller_dashboard_data(request):
+    if not request.is_seller:
+        return JsonResponse({'error': "Seller login required."}, status=403)
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 365)
+    except ValueError:
+        days = 30
+    seller_profile_id = request.seller_profile_id
+    today = timezone.localdate()
+    totals, best_products, popular_designs, series = await dashboard.gather_in_threads(
+        partial(dashboard.cached_order_totals, seller_profile_id),
+        partial(dashboard.cached_top_products, seller_profile_id, days=days, limit=5),
+        partial(dashboard.cached_top_designs, seller_profile_id, days=days, limit=5),
+        partial(dashboard.cached_daily_series, seller_profile_id,
+                today - datetime.timedelta(days=days - 1), today),
+    )
+    return JsonResponse({
+        'days': days,
+        'totals': totals,
+        'top_products': best_products,
+        'popular_designs': popular_designs,
+        'series': series,
+    })
+
+
 # handles placing an order for a product
 def product_order(request, product_id):
-    if not request.user.is_authenticated or hasattr(request.user, 'sellerprofile'):
+    if not request.user.is_authenticated or request.is_seller:
         return redirect('login')
     product = get_object_or_404(Product, id=product_id)
     error = None
@@ -379,18 +436,22 @@ def product_order(request, product_id):
         form = OrderForm(request.POST)
         if form.is_valid():
             quantity = form.cleaned_data['quantity']
-            if quantity > product.stock:
-                error = "Not enough stock available."
-            else:
-                order = form.save(commit=False)
-                order.customer = request.user
-                order.product = product
-                order.status = 'waiting'  # set default status
-                order.save()
-                product.stock -= quantity
-                product.save()
+            order = form.save(commit=False)
+            order.customer = request.user
+            order.product = product
+            order.status = 'waiting'  # set default status
+            with transaction.atomic():
+                # takes the stock in one conditional UPDATE, so two buyers cannot both get the
+                # last units and stock returned by cancellations in between is kept
+                taken = Product.objects.filter(id=product.id, stock__gte=quantity).update(
+                    stock=F('stock') - quantity, updated_at=timezone.now())
+                if taken:
+                    order.save()
+                    record_placed([order])
+            if taken:
                 messages.success(request, "Order placed!")
                 return redirect('order_list')
+            error = "Not enough stock available."
     else:
         form = OrderForm()
     return render(request, 'shop/product_order.html', {'product': product, 'form': form, 'error': error})
@@ -398,12 +459,12 @@ def product_order(request, product_id):
 
 # handles the customer's view for managing a single order
 def customer_manage_order(request, order_id):
-    if not request.user.is_authenticated or hasattr(request.user, 'sellerprofile'):
+    if not request.user.is_authenticated or request.is_seller:
         return redirect('login')
     order = get_object_or_404(Order, id=order_id, customer=request.user)
     # Try to get custom design if this is a custom bracelet order
-    custom_design = None
-    if order.product and order.product.name.startswith("Custom:"):
+    custom_design = order.custom_design
+    if custom_design is None and order.product and order.product.name.startswith("Custom:"):
         custom_design = CustomBraceletDesign.objects.filter(
             name=order.product.name.replace("Custom: ", ""),
             customer=request.user
@@ -412,6 +473,8 @@ def customer_manage_order(request, order_id):
     if request.method == 'POST':
         # handles order cancellation
         if 'cancel_order' in request.POST:
+            # the page is shown again with the error when the order cannot be cancelled
+            msg_form = OrderMessageForm()
             if order.cancelled:
                 messages.error(request, "Order is already cancelled.")
             elif order.done:
@@ -423,18 +486,16 @@ def customer_manage_order(request, order_id):
                     messages.error(
                         request, "Please provide a reason for cancellation.")
                 else:
-                    # mark cancelled and restore stock
-                    order.cancelled = True
-                    order.cancel_reason = cancel_reason
-                    try:
-                        product = order.product
-                        product.stock += order.quantity
-                        product.save()
-                    except Exception:
-                        # continue even if stock restore fails, but log message for user
-                        messages.warning(
-                            request, "Order cancelled but failed to restore stock automatically.")
-                    order.save()
+                    # mark cancelled and restore stock, only if the order is still open, the
+                    # expiry sweeper or a bulk cancel may have cancelled it since it was loaded
+                    with transaction.atomic():
+                        cancelled = Order.objects.filter(
+                            id=order.id, cancelled=False, done=False
+                        ).update(cancelled=True, cancel_reason=cancel_reason)
+                        if cancelled:
+                            restore_stock({order.product_id: order.quantity})
+                            record_cancelled([order])
+                            remove_open_orders([order])
                     messages.success(request, "Order cancelled.")
                     return redirect('order_list')
         else:
@@ -462,12 +523,12 @@ def customer_manage_order(request, order_id):
 
 # handles the seller's view for managing a single order
 def manage_order(request, order_id):
-    if not request.user.is_authenticated or not hasattr(request.user, 'sellerprofile'):
+    if not request.is_seller:
         return redirect('login')
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order, id=order_id, seller_id=request.seller_profile_id)
     # Try to get custom design if this is a custom bracelet order
-    custom_design = None
-    if order.product and order.product.name.startswith("Custom:"):
+    custom_design = order.custom_design
+    if custom_design is None and order.product and order.product.name.startswith("Custom:"):
         custom_design = CustomBraceletDesign.objects.filter(
             name=order.product.name.replace("Custom: ", ""),
             customer=order.customer
@@ -479,21 +540,15 @@ def manage_order(request, order_id):
         cancel_order = request.POST.get('cancel_order')
         cancel_reason = request.POST.get('cancel_reason')
         updated = False
+        completed = cancelled = False
         if status and status in dict(Order.STATUS_CHOICES):
             order.status = status
             updated = True
-        if mark_done == 'on' and order.status == 'delivered' and not order.cancelled:
-            order.done = True
-            order.delivered_at = timezone.now()  # set delivered timestamp
-            updated = True
+        if mark_done == 'on' and order.status == 'delivered' and not order.cancelled and not order.done:
+            updated = completed = True
         if cancel_order == 'on' and not order.cancelled:
             if cancel_reason and cancel_reason.strip():
-                order.cancelled = True
-                order.cancel_reason = cancel_reason.strip()
-                # Restore stock
-                order.product.stock += order.quantity
-                order.product.save()
-                updated = True
+                updated = cancelled = True
             else:
                 error = "Please provide a reason for cancellation."
         if 'send_message' in request.POST:
@@ -506,7 +561,30 @@ def manage_order(request, order_id):
                 messages.success(request, "Message sent.")
                 return redirect('manage_order', order_id=order.id)
         if updated and not error:
-            order.save()
+            with transaction.atomic():
+                # only the status column is saved, done and cancelled are set by conditional
+                # UPDATEs so an order the expiry sweeper or a bulk action already closed stays
+                # closed and its stock is returned once
+                order.save(update_fields=['status'])
+                if completed:
+                    completed = Order.objects.filter(
+                        id=order.id, status='delivered', done=False, cancelled=False
+                    ).update(done=True, delivered_at=timezone.now())  # set delivered timestamp
+                if cancelled:
+                    cancelled = Order.objects.filter(
+                        id=order.id, cancelled=False, done=False
+                    ).update(cancelled=True, cancel_reason=cancel_reason.strip())
+                    if cancelled:
+                        restore_stock({order.product_id: order.quantity})
+                order.refresh_from_db(fields=['done', 'cancelled', 'cancel_reason', 'delivered_at'])
+                # keep the sales counters in step with the order, completed and cancelled are the
+                # rows the UPDATEs above changed so an order is never counted out twice
+                if completed:
+                    record_completed([order])
+                if cancelled:
+                    record_cancelled([order])
+                if completed or cancelled:
+                    remove_open_orders([order])
             messages.success(request, "Order updated.")
             # stay on the same manage_order page to show updated state
             return redirect('manage_order', order_id=order.id)
@@ -523,26 +601,24 @@ def manage_order(request, order_id):
 
 # handles the seller's list of all orders
 def manage_orders_list(request):
-    if not request.user.is_authenticated or not hasattr(request.user, 'sellerprofile'):
+    if not request.is_seller:
         return redirect('login')
-    seller_profile = request.user.sellerprofile
-    qs = Order.objects.filter(product__created_by=seller_profile)
+    qs = Order.objects.filter(seller_id=request.seller_profile_id)
 
-    # filters from GET
-    status = request.GET.get('status')
-    cancelled = request.GET.get('cancelled')  # 'yes' or 'no' or ''
+    # handles bulk actions on the selected orders
+    if request.method == 'POST':
+        _apply_bulk_order_action(request, qs)
+        query = request.META.get('QUERY_STRING', '')
+        return redirect(request.path + (f"?{query}" if query else ""))
 
     # Sorting controls
     sort_by = request.GET.get('sort_by', 'created_at')
     sort_dir = request.GET.get('sort_dir', 'desc')  # 'asc' or 'desc'
 
-    # apply simple filters
-    if status:
-        qs = qs.filter(status=status)
-    if cancelled == 'yes':
-        qs = qs.filter(cancelled=True)
-    elif cancelled == 'no':
-        qs = qs.filter(cancelled=False)
+    include_archived = request.GET.get('archived') == 'yes'
+
+    # apply status, cancelled and date range filters
+    qs, filters = filter_orders(qs, request.GET)
 
     # safe ordering: only allow specific fields
     allowed_order_fields = {'created_at', 'delivered_at'}
@@ -552,27 +628,138 @@ def manage_orders_list(request):
     qs = qs.order_by(order_field)
 
     # handles pagination
-    paginator = Paginator(qs, 10)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if include_archived:
+        archived_qs, _ = filter_orders(
+            ArchivedOrder.objects.filter(seller_id=request.seller_profile_id), request.GET)
+        page_obj = paginate_with_archived(qs, archived_qs, sort_by, sort_dir, page_number)
+    else:
+        paginator = Paginator(qs, 10)
+        page_obj = paginator.get_page(page_number)
 
     return render(request, 'shop/manage_orders.html', {
         'page_obj': page_obj,
         'filters': {
-            'status': status or '',
-            'cancelled': cancelled or '',
+            **filters,
             'sort_by': sort_by,
             'sort_dir': sort_dir,
+            'archived': 'yes' if include_archived else '',
         },
         'status_choices': Order.STATUS_CHOICES,
     })
 
 
+# applies one bulk action from the order list to the selected orders
+def _apply_bulk_order_action(request, qs):
+    # repeated ids are one order, so they do not count as skipped
+    order_ids = sorted({int(value) for value in request.POST.getlist('order_ids') if value.isdigit()})
+    action = request.POST.get('bulk_action')
+    if not order_ids:
+        messages.error(request, "Select at least one order.")
+        return
+    selected = qs.filter(id__in=order_ids)
+
+    if action == 'advance':
+        changed = transition_orders(selected)
+    elif action == 'status':
+        target = request.POST.get('bulk_status')
+        if target not in Order.STATUS_TRANSITIONS.values():
+            messages.error(request, "Choose a status to move the orders to.")
+            return
+        changed = transition_orders(selected, target)
+    elif action == 'mark_done':
+        changed = complete_orders(selected)
+    elif action == 'cancel':
+        cancel_reason = request.POST.get('cancel_reason', '').strip()
+        if not cancel_reason:
+            messages.error(request, "Please provide a reason for cancellation.")
+            return
+        changed = cancel_orders(selected, cancel_reason)
+    else:
+        messages.error(request, "Unknown bulk action.")
+        return
+
+    skipped = len(order_ids) - changed
+    if skipped:
+        messages.warning(
+            request, f"Updated {changed} order(s), {skipped} could not make this change.")
+    else:
+        messages.success(request, f"Updated {changed} order(s).")
+
+
+# streams the seller's orders as csv or jsonl, using the order list filters
+def export_orders(request):
+    if not request.is_seller:
+        return redirect('login')
+    qs = Order.objects.filter(seller_id=request.seller_profile_id)
+    qs, _ = filter_orders(qs, request.GET)
+    return _export_response(request, 'orders', qs, request.GET.get('format'))
+
+
+# streams all custom bracelet designs as csv or jsonl
+def export_designs(request):
+    if not request.is_seller:
+        return redirect('login')
+    return _export_response(request, 'designs', CustomBraceletDesign.objects.all(), request.GET.get('format'))
+
+
+# beads needed by the seller's open custom orders, optionally for orders placed in a date range
+# and for one shape, color or size, downloadable with ?format=csv or jsonl
+def bead_demand_report(request):
+    if not request.is_seller:
+        return redirect('login')
+    date_from = parse_day(request.GET.get('date_from'))
+    date_to = parse_day(request.GET.get('date_to'))
+    # unknown bead values are ignored rather than matching nothing
+    beads = {}
+    for field, names in (('shape', SHAPE_NAMES), ('color', COLOR_NAMES), ('size', SIZE_NAMES)):
+        value = (request.GET.get(field) or '').lower()
+        if value in names:
+            beads[field] = value
+    rows = bead_demand.demand_rows(request.seller_profile_id, date_from, date_to, **beads)
+
+    if request.GET.get('format'):
+        return _export_response(request, 'bead-demand', rows, request.GET.get('format'))
+
+    by_bead = bead_demand.demand_by_bead(rows)
+    for row in by_bead:
+        row['shape_name'] = SHAPE_NAMES.get(row['shape'], row['shape'])
+        row['color_name'] = COLOR_NAMES.get(row['color'], row['color'])
+        row['size_name'] = SIZE_NAMES.get(row['size'], row['size'])
+    filters = {
+        'date_from': date_from.isoformat() if date_from else '',
+        'date_to': date_to.isoformat() if date_to else '',
+        **{field: beads.get(field, '') for field in ('shape', 'color', 'size')},
+    }
+    return render(request, 'shop/bead_demand.html', {
+        'by_bead': by_bead,
+        'by_letter': bead_demand.demand_by_letter(rows),
+        'total_beads': sum(row['beads'] for row in by_bead),
+        'filters': filters,
+        'week_start': bead_demand.week_start().isoformat(),
+        'shapes': SHAPE_NAMES.items(),
+        'colors': COLOR_NAMES.items(),
+        'sizes': SIZE_NAMES.items(),
+    })
+
+
+# builds a streaming download response for an export, async under ASGI so the rows are
+# sent as they are read instead of being collected first
+def _export_response(request, kind, qs, fmt):
+    fmt = 'jsonl' if fmt == 'jsonl' else 'csv'
+    content_type = 'application/x-ndjson' if fmt == 'jsonl' else 'text/csv'
+    stream = astream_export if isinstance(request, ASGIRequest) else stream_export
+    response = StreamingHttpResponse(stream(kind, qs, fmt), content_type=content_type)
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{stamp}.{fmt}"'
+    return response
+
+
 # handles the seller's list of all products
 def manage_products_list(request):
-    if not request.user.is_authenticated or not hasattr(request.user, 'sellerprofile'):
+    if not request.is_seller:
         return redirect('login')
-    seller_profile = request.user.sellerprofile
+    seller_profile_id = request.seller_profile_id
 
     # handles stock update POST
     if request.method == 'POST' and 'update_stock' in request.POST:
@@ -580,16 +767,16 @@ def manage_products_list(request):
         new_stock = request.POST.get('new_stock')
         try:
             product = Product.objects.get(
-                id=product_id, created_by=seller_profile)
+                id=product_id, created_by_id=seller_profile_id)
             product.stock = max(0, int(new_stock))
-            product.save()
+            product.save(update_fields=['stock', 'updated_at'])
             messages.success(request, f"Stock updated for {product.name}!")
         except Exception:
             messages.error(request, "Failed to update stock.")
         qs = request.META.get('QUERY_STRING', '')
         return redirect(request.path + (f"?{qs}" if qs else ""))
 
-    qs = Product.objects.filter(created_by=seller_profile)
+    qs = Product.objects.filter(created_by_id=seller_profile_id)
 
     # simple sorting controls
     sort_by = request.GET.get('sort_by', 'created_at')
@@ -622,20 +809,82 @@ def manage_products_list(request):
     })
 
 
-# handles updating the seller's credentials
+# shows request latency percentiles per endpoint
+def seller_perf(request):
+    if not request.is_seller:
+        return redirect('login')
+    return render(request, 'shop/seller_perf.html', {
+        'rows': profiling.timing_summary(),
+        'profiling_enabled': getattr(settings, 'SHOP_PROFILING', False),
+    })
+
+
+# bulk editor and csv import for the seller's products
+def bulk_edit_products(request):
+    if not request.is_seller:
+        return redirect('login')
+    seller_profile_id = request.seller_profile_id
+    row_errors = []
+
+    if request.method == 'POST':
+        rows = None
+        if 'import_csv' in request.POST:
+            upload = request.FILES.get('csv_file')
+            if not upload:
+                messages.error(request, "Please choose a CSV file to import.")
+            else:
+                try:
+                    rows = read_product_csv(upload.read().decode('utf-8-sig'))
+                except (UnicodeDecodeError, ValueError) as exc:
+                    messages.error(request, f"Could not read the CSV file: {exc}")
+        else:
+            # one row per product shown in the editor
+            rows = [
+                (f"Product {product_id}", {
+                    'id': product_id,
+                    'name': request.POST.get(f'name_{product_id}'),
+                    'price': request.POST.get(f'price_{product_id}'),
+                    'stock': request.POST.get(f'stock_{product_id}'),
+                })
+                for product_id in request.POST.getlist('product_ids')
+            ]
+        if rows is not None:
+            updated, row_errors = apply_product_changes(seller_profile_id, rows)
+            messages.success(request, f"Updated {updated} product(s).")
+            if not row_errors:
+                qs = request.META.get('QUERY_STRING', '')
+                return redirect(request.path + (f"?{qs}" if qs else ""))
+
+    qs = Product.objects.filter(created_by_id=seller_profile_id).exclude(
+        name__startswith='Custom:').order_by('name', 'id')
+    search = request.GET.get('search', '').strip()
+    if search:
+        qs = qs.filter(name__icontains=search)
+
+    # handles pagination
+    paginator = Paginator(qs, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    return render(request, 'shop/manage_products_bulk.html', {
+        'page_obj': page_obj,
+        'row_errors': row_errors,
+        'filters': {'search': search},
+    })
+
+
+# handles updating the logged-in seller's credentials
 def update_seller_view(request):
-    seller_profile = SellerProfile.objects.first()
-    if not seller_profile:
-        return redirect('register')
-    seller_user = seller_profile.user
+    if not request.is_seller:
+        return redirect('login')
+    seller_user = request.user
     if request.method == 'POST':
         form = SellerUpdateForm(request.POST, instance=seller_user)
         if form.is_valid():
             seller_user.username = form.cleaned_data['username']
             seller_user.set_password(form.cleaned_data['password1'])
-            seller_user.is_superuser = True
-            seller_user.is_staff = True
             seller_user.save()
+            # customers pick sellers by name
+            roles.invalidate_roles(seller_user.pk)
             messages.success(
                 request, "Seller credentials updated successfully.")
             return redirect('login')
@@ -648,7 +897,7 @@ def update_seller_view(request):
 
 # page for customers to view their custom designs
 def customize_bracelet(request):
-    if not request.user.is_authenticated or hasattr(request.user, 'sellerprofile'):
+    if not request.user.is_authenticated or request.is_seller:
         return redirect('login')
     # handles deleting a design
     if request.method == 'POST' and 'delete_design_id' in request.POST:
@@ -656,35 +905,39 @@ def customize_bracelet(request):
         design = CustomBraceletDesign.objects.filter(
             id=design_id, customer=request.user).first()
         if design:
-            design.delete()
+            with transaction.atomic():
+                # open orders lose their design, so their beads leave the demand first
+                remove_open_orders(design.orders.filter(done=False, cancelled=False))
+                design.delete()
             messages.success(request, "Custom bracelet design deleted.")
         else:
             messages.error(request, "Design not found or not yours.")
         return redirect('customize_bracelet')
     designs = CustomBraceletDesign.objects.filter(
         customer=request.user).order_by('-created_at')
+    design_cards = render_fragments(
+        'shop/partials/my_design_card.html', designs, 'design')
     return render(request, 'shop/customize_bracelet.html', {
-        'designs': designs,
+        'design_cards': design_cards,
     })
 
 
 # page for creating a new custom bracelet design
 def bracelet_designer(request):
-    if not request.user.is_authenticated or hasattr(request.user, 'sellerprofile'):
+    if not request.user.is_authenticated or request.is_seller:
         return redirect('login')
     if request.method == 'POST':
         name = request.POST.get('name', '').strip()
         beads = request.POST.get('beads', '[]')
+        # the design is checked and canonicalized before anything touches the database
         try:
-            beads_list = json.loads(beads)
-        except Exception:
-            beads_list = []
-        if not name or not (15 <= len(beads_list) <= 25):
-            messages.error(
-                request, "Name required and design must have 15-25 beads.")
+            if not name or len(name) > DESIGN_NAME_LENGTH:
+                raise ValueError(f"Name is required and at most {DESIGN_NAME_LENGTH} characters.")
+            beads_list = clean_beads(beads)
+        except ValueError as error:
+            messages.error(request, str(error))
             return render(request, 'shop/bracelet_designer.html', {
                 'name': name,
-                'beads': beads,
             })
         design = CustomBraceletDesign.objects.create(
             name=name,
@@ -697,57 +950,83 @@ def bracelet_designer(request):
 
 
 # displays the details of a single custom bracelet design
-def bracelet_design_detail(request, design_id):
-    design = get_object_or_404(CustomBraceletDesign, id=design_id)
-    return render(request, 'shop/bracelet_design_detail.html', {
+@reads_from_replica
+@vary_on_cookie
+@http_cache.acondition(etag_func=http_cache.design_detail_etag,
+                       last_modified_func=http_cache.design_detail_last_modified)
+async def bracelet_design_detail(request, design_id):
+    design = await aget_object_or_404(CustomBraceletDesign, id=design_id)
+    return await arender(request, 'shop/bracelet_design_detail.html', {
         'design': design,
     })
 
 
 # handles placing an order for a custom bracelet design
 def order_custom_bracelet(request, design_id):
-    if not request.user.is_authenticated or hasattr(request.user, 'sellerprofile'):
+    if not request.user.is_authenticated or request.is_seller:
         return redirect('login')
     design = get_object_or_404(CustomBraceletDesign, id=design_id)
+    sellers = roles.seller_list()
     if request.method == 'POST':
-        # Find seller (assume only one seller profile)
-        seller_profile = SellerProfile.objects.first()
-        # Create a Product for this custom design if needed
-        product = Product.objects.create(
-            name=f"Custom: {design.name}",
-            price=Decimal('0.00'),
-            image=None,
-            created_by=seller_profile,
-            stock=0
-        )
-        # Create an Order for this design
-        Order.objects.create(
-            customer=request.user,
-            product=product,
-            quantity=1,
-            payment_type=request.POST.get('payment_type', 'gcash'),
-            status='waiting',
-        )
+        # the customer picks the seller who makes the bracelet, the only seller needs no picking
+        seller_ids = {seller_id for seller_id, _ in sellers}
+        try:
+            seller_profile_id = int(request.POST.get('seller') or (sellers[0][0] if len(sellers) == 1 else 0))
+        except ValueError:
+            seller_profile_id = 0
+        if seller_profile_id not in seller_ids:
+            messages.error(request, "Please choose a seller for your bracelet.")
+            return redirect('order_custom_bracelet', design_id=design.id)
+        with transaction.atomic():
+            # Create a Product for this custom design if needed
+            product = Product.objects.create(
+                name=f"Custom: {design.name}",
+                price=Decimal('0.00'),
+                image=None,
+                created_by_id=seller_profile_id,
+                stock=0
+            )
+            # Create an Order for this design
+            order = Order.objects.create(
+                customer=request.user,
+                product=product,
+                seller_id=seller_profile_id,
+                quantity=1,
+                payment_type=request.POST.get('payment_type', 'gcash'),
+                status='waiting',
+                custom_design=design,
+            )
+            record_placed([order])
+            add_open_orders([order])
         messages.success(request, "Custom bracelet order placed!")
         return redirect('order_list')
     return render(request, 'shop/order_custom_bracelet.html', {
         'design': design,
+        'sellers': sellers,
     })
 
 
 # displays a list of public custom designs made by other users
-def public_custom_designs(request):
+@reads_from_replica
+@vary_on_cookie
+@http_cache.acondition(etag_func=http_cache.public_designs_etag,
+                       last_modified_func=http_cache.public_designs_last_modified)
+async def public_custom_designs(request):
     if not request.user.is_authenticated:
         return redirect('login')
     # Show all designs except own if customer, or all if seller
-    if hasattr(request.user, 'sellerprofile'):
-        designs = CustomBraceletDesign.objects.all().order_by('-created_at')
-        can_order = False
+    designs = http_cache.public_designs_queryset(request)
+    sort = http_cache.public_designs_sort(request)
+    if sort == 'popular':
+        designs = order_by_popularity(designs)
     else:
-        designs = CustomBraceletDesign.objects.exclude(
-            customer=request.user).order_by('-created_at')
-        can_order = True
-    return render(request, 'shop/public_custom_designs.html', {
-        'designs': designs,
-        'can_order': can_order,
+        designs = designs.order_by('-created_at')
+    can_order = not request.is_seller
+    design_cards = await arender_fragments(
+        'shop/partials/design_card.html', designs.select_related('customer'), 'design',
+        variant='order' if can_order else 'view',
+        extra_context={'can_order': can_order}, related_fields=('customer__username',))
+    return await arender(request, 'shop/public_custom_designs.html', {
+        'design_cards': design_cards,
+        'sort': sort,
     })
\ No newline at end of file